@@ -1,14 +1,30 @@
 from shiny import reactive
+from shiny.session import get_current_session
 from shiny.express import input, render, ui
-from shared import df_main, df_survey, model, process_inputs, beau_column_names, df_in_out,df_salaries
-from shared import _THRESHOLD, _COLS_TO_DROP, _DEPT_LIST, _THRESHOLD
-from shinywidgets import render_plotly
+from shared import df_survey, predict_profile, explain_profile, sweep_profile, score_upload, beau_column_names, df_in_out,df_salaries, employees, take
+from shared import employee_index, survey_index, employee_search, survey_search, employee_kpi_cells, churn_cube, employees_key, threshold_index
+from shared import nbytes, table_bytes, survey_store, comment_index
+from shared import employee_sort, survey_sort, DISPLAY_NAMES, _MAIN_TABLE_COLS
+from tables import page_count, page_rows, page_html
+from export import FORMATS as EXPORT_FORMATS, export_chunks, in_thread
+from plotcache import cached_plot
+from filterstate import FilterState
+from metrics import timed
+import metrics
+from shared import _THRESHOLD, _DEPT_LIST, _THRESHOLD, _OVER_THRESHOLD
+from kpis import breakdown
+from features import leaving_label, _SALARY_BINS
+from predictor import crossings
 import shinyswatch
 import datetime
+import time
 import seaborn as sns
 import matplotlib.pyplot as plt
 import random
+import colorsys
 import pandas as pd
+import numpy as np
+import os
 
 
 _SEL_ALL = 'SELECT ALL'
@@ -17,6 +33,49 @@ _DARK_COLOR = '#000000'
 _LIGHT_FONT = '#ffffff'
 _HIGHLIGHT_COLOR = '#999999'
 _PCT = random.uniform(25,85)
+#CHURN_PLOTS=plotly sends the Overview/Breakdown charts as plotly figures of their aggregates,
+#drawn in the browser, instead of PNGs rendered here
+_PLOTLY = os.environ.get('CHURN_PLOTS', 'matplotlib') == 'plotly'
+#plotly is only needed in that mode
+if _PLOTLY:
+    import figures
+#rows per page of the Employee Data/Survey Data tables
+_PAGE_SIZE = 100
+_PAGER_STYLE = "display: flex; gap: .5rem; align-items: baseline; flex-wrap: wrap;"
+#formats of the Employee Data table, applied to the visible page only
+_MAIN_TABLE_FORMATS = {
+                'Satisfaction Score': '{0:0.2f}'.format,
+                'Years since Onboarding': '{0:0.2f}'.format,
+                'Last Evaluation Score': '{0:0.2f}'.format,
+                'Salary': '{0:,}'.format,
+                'Probability of Leaving': lambda x: '{:.2%}'.format(x) if not pd.isna(x) else 'N/A',
+                'Average Hours Worked (Monthly)': '{0:.0f}'.format,
+}
+_SURVEY_TABLE_FORMATS = {'Date': '{0:%Y-%m-%d}'.format}
+#rows serialized per chunk of a download
+_EXPORT_BATCH = int(os.environ.get('CHURN_EXPORT_BATCH', 20000))
+#calculator wording of the model features, in the order of the attribution columns
+_FEATURE_LABELS = [
+                'Last Evaluation Score',
+                'Logged Work Accident',
+                'Total Projects',
+                'Average Hours Worked per Month',
+                'Years Working Here',
+                'Promotion within the Last 5 Years',
+                'Salary Band',
+]
+#strongest attributions listed under a prediction
+_EXPLAIN_TOP = 3
+#inputs the what-if sweep can vary: label and (low, high) to spread the grid over, or the values
+_SWEEP_INPUTS = {
+                'average_monthly_hours': ('Average Hours Worked per Month', (96, 320)),
+                'salary': ('Current Salary', (8000000, 60000000)),
+                'number_project': ('Total Projects (Ongoing/Completed)', np.arange(1, 11)),
+                'promotion_last_5years': ('Promotion within the Last 5 Years', np.array([False, True])),
+}
+#grid points per varied input, 200 x 200 at most
+_SWEEP_STEPS = 100
+_SWEEP_MAX_STEPS = 200
 
 ui.page_opts(title="Employees Churn Rate",
             fillable=True,
@@ -24,11 +83,171 @@ ui.page_opts(title="Employees Churn Rate",
             )
 
 
-#REACTIVE VALUE
-temp_df_main = reactive.value(beau_column_names())#.drop(columns = _COLS_TO_DROP))
-temp_df_survey = reactive.value(df_survey)
-
-_MAIN_FILTER_NOT_GONE = "~temp_df_main()['Departed']"
+#FILTER STATE
+#the Breakdown, Employee Data and Survey Data filters all write into filters (see filterstate.py),
+#the selections below are derived from it. filter results are row positions into the shared
+#df_main/df_survey, never per-session copies
+filters = FilterState(_DEPT_LIST)
+
+#a search box's value as the filter stores it
+def search_id(value):
+    return None if pd.isna(value) else value
+
+#employees matching the filters, recomputed on a new extract too.
+#no department ticked is every department here, like the checkbox has always behaved
+@reactive.calc
+@timed('calc')
+def sel_main():
+    f = filters.main()
+    filters.recomputed('employee rows')
+    rows = employee_index().select(list(f['main_depts'] or ()) or None, f['prob'])
+
+    #names and IDs match anywhere, like the table's search always has
+    if f['main_name']:
+        rows = employee_search()['name'].contains(f['main_name'], within=rows)
+    if f['main_id'] is not None:
+        rows = employee_search()['id'].contains(f['main_id'], within=rows)
+    return employee_index().compact(rows)
+
+#departments sel_main holds in full, None once a probability/name/ID filter narrowed it.
+#while set, plots are answered from churn_cube() instead of rows
+@reactive.calc
+@timed('calc')
+def sel_main_depts():
+    f = filters.main()
+    employees()
+    filters.recomputed('employee departments')
+    whole = tuple(f['prob']) == (0, 1) and not f['main_name'] and f['main_id'] is None
+    return list(f['main_depts'] or _DEPT_LIST) if whole else None
+
+#survey responses matching the filters, no department ticked matches nothing
+@reactive.calc
+@timed('calc')
+def sel_survey():
+    f = filters.survey()
+    filters.recomputed('survey rows')
+    rows = survey_index.select(None if f['survey_depts'] is None else list(f['survey_depts']), f['dates'])
+
+    if f['survey_name']:
+        rows = survey_search['Employee Name'].contains(f['survey_name'], within=rows)
+    if f['survey_id'] is not None:
+        rows = survey_search['Employee ID'].contains(f['survey_id'], within=rows)
+    if f['comments'].strip():
+        rows = comment_index.search(f['comments'], within=rows)
+    return survey_index.compact(rows)
+
+#(departments, dates) sel_survey holds in full (None is no restriction), None once a name/ID/
+#comment search narrowed it. while set, the driver KPIs/chart are answered from survey_store
+@reactive.calc
+@timed('calc')
+def sel_survey_spec():
+    f = filters.survey()
+    filters.recomputed('survey spec')
+    if f['survey_name'] or f['survey_id'] is not None or f['comments'].strip():
+        return None
+    return (None if f['survey_depts'] is None else list(f['survey_depts']), f['dates'])
+
+#the inputs showing each filter field, with the button of the panel they sit on
+_FILTER_INPUTS = {
+            'main_depts': (('dept_1', 'filter_main'), ('dept_3', 'filter_both')),
+            'survey_depts': (('dept_2', 'filter_survey'),),
+            'prob': (('pct_slider_1', 'filter_main'), ('pct_slider_2', 'filter_both')),
+            'dates': (('dt_rng_1', 'filter_survey'), ('dt_rng_2', 'filter_both')),
+}
+
+#the other panels' inputs show what a click changed. only the changed fields are pushed and
+#never to the panel clicked, so a click leaves whatever is being set up elsewhere alone
+@reactive.effect
+@timed('effect')
+def sync_filter_inputs():
+    f = filters.committed()
+    for field in filters.fields & set(_FILTER_INPUTS):
+        for panel, source in _FILTER_INPUTS[field]:
+            if source == filters.last_click:
+                continue
+            if field.endswith('depts'):
+                ui.update_checkbox_group(panel, selected=list(_DEPT_LIST) if f[field] is None else list(f[field]))
+            elif field == 'prob':
+                ui.update_slider(panel, value=(round(f['prob'][0] * 100), round(f['prob'][1] * 100)))
+            elif f['dates'] is not None:
+                ui.update_date_range(panel, start=f['dates'][0].date(), end=f['dates'][1].date())
+
+
+def not_gone(rows):
+    return ~employee_index().gone[rows]
+
+
+#LEAVING/STAYING CUT-OFF OF THIS SESSION, the Overview slider
+def threshold():
+    return input.threshold()
+
+#current employees per department and Leaving/Staying at the session's threshold
+@reactive.calc
+@timed('calc')
+def leaving_counts():
+    return threshold_index().counts(threshold())
+
+
+#every Breakdown card reads this, one bincount per selection
+@reactive.calc
+@timed('calc')
+def breakdown_kpis():
+    return breakdown(employee_kpi_cells(), sel_main())
+
+
+#what the Breakdown employee plots are drawn from, their render cache key
+def main_view():
+    depts = sel_main_depts()
+    return employees_key(), depts if depts is not None else sel_main()
+
+
+#AGGREGATES THE BREAKDOWN PLOTS DRAW, shared by the matplotlib and plotly versions
+@reactive.calc
+@timed('calc')
+def median_hours():
+    #the cube's Leaving/Staying is the default cut-off's, other thresholds label the rows
+    if sel_main_depts() is not None and threshold() == _THRESHOLD:
+        temp_df = churn_cube().median('average_monthly_hours', ['department', 'Leaving/Staying'], department=sel_main_depts(), gone=False)
+    else:
+        df_main, rows = employees(), sel_main()
+        temp_df = take(df_main, rows[not_gone(rows)], ['department','prob','average_monthly_hours'])
+        temp_df['Leaving/Staying'] = pd.Categorical(leaving_label(temp_df.pop('prob'), threshold()), categories=['Leaving', 'Staying'])
+        temp_df = temp_df.groupby(['department', 'Leaving/Staying'], observed=True).median().reset_index()
+
+    return temp_df.astype({'department': str})
+
+@reactive.calc
+@timed('calc')
+def mean_hours():
+    if sel_main_depts() is not None:
+        temp_df = churn_cube().mean('average_monthly_hours', ['department'], department=sel_main_depts())
+    else:
+        temp_df = take(employees(), sel_main(), ['department','average_monthly_hours'])
+        temp_df = temp_df.groupby('department', observed=True).mean().reset_index()
+
+    return temp_df.astype({'department': str})
+
+@reactive.calc
+@timed('calc')
+def survey_drivers():
+    if sel_survey_spec() is not None:
+        return survey_store.department_means(*sel_survey_spec(), drivers=['Work-Life Balance','Salary','Management','Workload','Growth Opportunities'])
+    temp_df = take(df_survey, sel_survey(), ['Department', 'Work-Life Balance','Salary','Management','Workload','Growth Opportunities'])
+    return temp_df.groupby('Department', observed=True).mean().reset_index()
+
+#{driver: mean} for the survey KPI cards
+@reactive.calc
+@timed('calc')
+def survey_means():
+    if sel_survey_spec() is not None:
+        return survey_store.means(*sel_survey_spec())
+    rows = sel_survey()
+    return {c: df_survey[c].to_numpy()[rows].mean() for c in ['Work-Life Balance', 'Workload', 'Management', 'Growth Opportunities']}
+
+#what the survey chart is drawn from, its render cache key
+def survey_view():
+    spec = sel_survey_spec()
+    return spec if spec is not None else sel_survey()
 
 
 
@@ -64,17 +283,26 @@ ui.nav_spacer()
 
 
 #KPI CARD FORMAT
+#num is NaN when nothing is selected, shown as N/A like the tables do
 def kpi(title, num, pct=False, integer=False):
     return ui.tags.div(
         ui.tags.div(
             ui.tags.p(f'{title}'),
             style = "font-size: 2rem;"
         ),
-    ui.tags.p('{0:.2%}'.format(num))if pct else ui.tags.p('{0:.2f}'.format(num)) if not integer else ui.tags.p('{0}'.format(num)),
+    ui.tags.p('N/A') if pd.isna(num) else ui.tags.p('{0:.2%}'.format(num))if pct else ui.tags.p('{0:.2f}'.format(num)) if not integer else ui.tags.p('{0}'.format(num)),
     style = f"font-size: 4.5rem; text-align: center; font-weight: bold; line-height:1.2; color: white;"
     )
 
 
+#WHERE A TABLE PAGE SITS IN ITS ROWS
+def page_label(n, page):
+    pages = page_count(n, _PAGE_SIZE)
+    page = min(max(page or 1, 1), pages)
+    first = (page - 1) * _PAGE_SIZE
+    return f'rows {min(first + 1, n):,}-{min(first + _PAGE_SIZE, n):,} of {n:,}, page {page:,} of {pages:,}'
+
+
 
 
 
@@ -95,69 +323,88 @@ with ui.nav_panel("Overview"):
                     )
                     "Click to toggle the breakdown of predicted outcome."
 
-                @render.plot
-                @reactive.event(input.stackswitch)
-                def plot_1():
-                    
-                    temp = df_main[~df_main['gone']][['department','satisfaction_level', 'Leaving/Staying']].groupby(['department', 'Leaving/Staying']).count().reset_index()
-
-                    if input.stackswitch():
-                        temp_stay = temp[temp['Leaving/Staying'] == 'Staying']
-                        temp_leave = temp[temp['Leaving/Staying'] == 'Leaving']
-
-
-                        ax = sns.barplot(x='department', y='satisfaction_level', data=temp_stay, color='green', label='Staying')
-                        sns.barplot(x='department', y='satisfaction_level', data=temp_leave, color='red', label='Leaving', bottom=temp[temp['Leaving/Staying'] == 'Staying']['satisfaction_level'].values)
-
-                        for i, bar in enumerate(ax.containers[0]):  
-
-                            height = bar.get_height()
-                            ax.text(
-                                bar.get_x() + bar.get_width() / 2, 
-                                height,                            
-                                f'{height:.0f}',                    
-                                ha='center', va='bottom'           
-                            )
+                with ui.div(style=_PAGER_STYLE):
+                    ui.input_slider('threshold', 'Flag as Leaving from a probability of', 0.05, 0.95, _THRESHOLD, step=0.01)
+
+                    @render.text
+                    @timed('render')
+                    def leaving_total():
+                        leaving, total = threshold_index().leaving(threshold())
+                        return f'{leaving:,} of {total:,} current employees flagged as Leaving ({leaving / max(total, 1):.1%})'
+
+                if _PLOTLY:
+                    @figures.render_figure
+                    @timed('render')
+                    def plot_1():
+                        #the switch is handled in the browser, the figure is not rebuilt when it changes
+                        with reactive.isolate():
+                            stacked = input.stackswitch()
+                        fig = figures.department_headcount(leaving_counts(), colors, stacked)
+                        return figures.to_ui(fig, 'plot_1_fig', figures.stack_toggle('plot_1_fig', 'stackswitch'))
+                else:
+                    @cached_plot(state=lambda: (input.stackswitch(), employees_key(), threshold()))
+                    @reactive.event(input.stackswitch, input.threshold, employees)
+                    @timed('render')
+                    def plot_1():
+                        temp = leaving_counts().rename(columns={'count': 'satisfaction_level'})
+
+                        if input.stackswitch():
+                            temp_stay = temp[temp['Leaving/Staying'] == 'Staying']
+                            temp_leave = temp[temp['Leaving/Staying'] == 'Leaving']
+
+
+                            ax = sns.barplot(x='department', y='satisfaction_level', data=temp_stay, color='green', label='Staying')
+                            sns.barplot(x='department', y='satisfaction_level', data=temp_leave, color='red', label='Leaving', bottom=temp[temp['Leaving/Staying'] == 'Staying']['satisfaction_level'].values)
+
+                            for i, bar in enumerate(ax.containers[0]):  
+
+                                height = bar.get_height()
+                                ax.text(
+                                    bar.get_x() + bar.get_width() / 2, 
+                                    height,                            
+                                    f'{height:.0f}',                    
+                                    ha='center', va='bottom'           
+                                )
 
-                        # ax.bar_label(ax.containers[0], fmt='%d', label_type='center')
+                            # ax.bar_label(ax.containers[0], fmt='%d', label_type='center')
 
 
                     
-                        for i, bar in enumerate(ax.containers[1]):  
+                            for i, bar in enumerate(ax.containers[1]):  
 
-                            adjusted_label = temp_leave.iloc[i]['satisfaction_level']
-                            stay_value = temp_stay.iloc[i]['satisfaction_level']
+                                adjusted_label = temp_leave.iloc[i]['satisfaction_level']
+                                stay_value = temp_stay.iloc[i]['satisfaction_level']
 
-                            ax.text(
-                                bar.get_x() + bar.get_width() / 2, 
-                                bar.get_height() + stay_value+20,  
-                                f'{int(adjusted_label)}', ha='center', va='center'
-                            )
+                                ax.text(
+                                    bar.get_x() + bar.get_width() / 2, 
+                                    bar.get_height() + stay_value+20,  
+                                    f'{int(adjusted_label)}', ha='center', va='center'
+                                )
                             
-                        ax.set_title('Estimated total employees staying/leaving in each department')
-                        plt.legend()
-                    else:
-                        ax = sns.barplot(temp, x='department', y='satisfaction_level',estimator='sum', errorbar=None, palette=colors)
-                        # ax.bar_label(ax.containers[0])
-                        for bar in ax.patches:
-                            height = bar.get_height()
-                            ax.text(
-                                bar.get_x() + bar.get_width() / 2, 
-                                height,                            
-                                f'{height:.0f}',                    
-                                ha='center', va='bottom'           
-                            )
+                            ax.set_title('Estimated total employees staying/leaving in each department')
+                            plt.legend()
+                        else:
+                            ax = sns.barplot(temp, x='department', y='satisfaction_level',estimator='sum', errorbar=None, palette=colors)
+                            # ax.bar_label(ax.containers[0])
+                            for bar in ax.patches:
+                                height = bar.get_height()
+                                ax.text(
+                                    bar.get_x() + bar.get_width() / 2, 
+                                    height,                            
+                                    f'{height:.0f}',                    
+                                    ha='center', va='bottom'           
+                                )
 
-                        ax.set_title('Total employees in each department')
+                            ax.set_title('Total employees in each department')
                         
 
-                    ax.set_xlabel("")
-                    ax.set_ylabel("")
+                        ax.set_xlabel("")
+                        ax.set_ylabel("")
 
-                    return ax
+                        return ax
                 
                 ui.div(
-                    ui.card_footer(f'*Prediction based on past 10 years employees data, and is flagged as "Leaving" when the calculated probability exceeds {_THRESHOLD:.0%}. Salaries adjusted for inflation and industry/title average.'),
+                    ui.card_footer(f'*Prediction based on past 10 years employees data, and is flagged as "Leaving" when the calculated probability reaches the threshold set above ({_THRESHOLD:.0%} by default). Salaries adjusted for inflation and industry/title average.'),
                     style="font-weight: bold; font-style: italic;background-color: black; color: white; margin-bottom:-15px; width: 100%; text-align: right;"
                 )
 
@@ -166,84 +413,127 @@ with ui.nav_panel("Overview"):
                 with ui.layout_columns(col_widths=(8,4,12)):
                     with ui.card(full_screen=True):
                         
-                        @render.plot
-                        def plot_osat():
-                            temp = df_main[df_main['gone'] == 0][['department','satisfaction_level']]
-                            
-                            ax = sns.boxplot(data=temp, x='satisfaction_level',
-                                                y = 'department',
-                                                palette=colors,            
-                                                whiskerprops=dict(color='white'),
+                        if _PLOTLY:
+                            @figures.render_figure
+                            @timed('render')
+                            def plot_osat():
+                                stats = churn_cube().boxplot_stats('satisfaction_level', 'department', gone=False)
+                                depts = [d for d in _DEPT_LIST if d in stats]
+                                return figures.to_ui(figures.satisfaction_box(stats, depts, colors), 'plot_osat_fig')
+                        else:
+                            @cached_plot(state=employees_key)
+                            @timed('render')
+                            def plot_osat():
+                                stats = churn_cube().boxplot_stats('satisfaction_level', 'department', gone=False)
+                                depts = [d for d in _DEPT_LIST if d in stats]
+
+                                #the boxes sns.boxplot would draw, from the cube's quartiles instead of the rows
+                                palette = sns.color_palette(colors, len(depts))
+                                lum = min(colorsys.rgb_to_hls(*c)[1] for c in palette) * .6
+
+                                fig, ax = plt.subplots()
+                                boxes = ax.bxp([stats[d] for d in depts], positions=range(len(depts)), widths=.8, capwidths=.4,
+                                                vert=False, patch_artist=True, manage_ticks=False,
+                                                boxprops=dict(edgecolor=(lum, lum, lum), linewidth=plt.rcParams['patch.linewidth']),
+                                                whiskerprops=dict(color='white', solid_capstyle='butt'),
                                                 capprops=dict(color='white'),
-                                                medianprops=dict(color='white'),
-                                                flierprops=dict(markerfacecolor='white', markeredgecolor='white', marker='o')
+                                                medianprops=dict(color='white', solid_capstyle='butt'),
+                                                flierprops=dict(markerfacecolor='white', markeredgecolor='white', marker='o', markersize=5)
                                             )
-                            ax.set_xlabel('Satisfaction Score')
-                            ax.set_ylabel('')
+                                for box, color in zip(boxes['boxes'], palette):
+                                    box.set_facecolor(sns.desaturate(color, .75))
+
+                                ax.set_yticks(range(len(depts)), depts)
+                                ax.set_ylim(len(depts) - .5, -.5)
+                                ax.yaxis.grid(False)
+                                ax.set_xlabel('Satisfaction Score')
+                                ax.set_ylabel('')
 
-                            return ax
+                                return ax
 
 
                     with ui.layout_columns(col_widths=(-1,12,-1)):
                         with ui.card(full_screen=True):
 
-                            avg = df_main[df_main['gone'] == 0]['satisfaction_level'].mean()
                             target = 8
-                            color = 'red' if avg < target else 'green'
 
-                            ui.div(
-                                ui.tags.p('Average Overall:'),
-                                ui.div(
-                                    ui.tags.p('{0:.2f}{1}'.format(avg, '👎' if target > avg else '👍')),
-                                    style=f"color: {color}"
-                                ),
-                                ui.div(
-                                    ui.tags.p('Target: {0:.1f}'.format(target)),
-                                    style= " font-size: 1rem !important; text-align: right; padding-right: .2rem;"
-                                ),
-                                style = "text-align: center; background-color: black; font-size: 3rem; height: auto; margin-bottom: -2rem;"
-                            )
+                            @render.ui
+                            @timed('render')
+                            def avg_osat():
+                                avg = churn_cube().mean('satisfaction_level', gone=False)
+                                color = 'red' if avg < target else 'green'
+
+                                return ui.div(
+                                    ui.tags.p('Average Overall:'),
+                                    ui.div(
+                                        ui.tags.p('{0:.2f}{1}'.format(avg, '👎' if target > avg else '👍')),
+                                        style=f"color: {color}"
+                                    ),
+                                    ui.div(
+                                        ui.tags.p('Target: {0:.1f}'.format(target)),
+                                        style= " font-size: 1rem !important; text-align: right; padding-right: .2rem;"
+                                    ),
+                                    style = "text-align: center; background-color: black; font-size: 3rem; height: auto; margin-bottom: -2rem;"
+                                )
 
                         with ui.card(full_screen=True):
-                            ui.card_header(f"Total Response: {len(df_main[df_main['gone'] == 0])}")
-                            @render.plot
-                            def asd():
-                                temp = df_main[df_main['gone'] == 0][['department','satisfaction_group']]
+                            with ui.card_header():
+                                @render.text
+                                @timed('render')
+                                def total_response():
+                                    return f"Total Response: {churn_cube().count(gone=False)}"
+                            if _PLOTLY:
+                                @figures.render_figure
+                                @timed('render')
+                                def asd():
+                                    return figures.to_ui(figures.satisfaction_pie(churn_cube().count(['satisfaction_group'], gone=False).dropna()), 'asd_fig')
+                            else:
+                                @cached_plot(state=employees_key)
+                                @timed('render')
+                                def asd():
+                                    temp = churn_cube().count(['satisfaction_group'], gone=False).dropna().set_index('satisfaction_group')['count']
 
-                                fig, ax = plt.subplots()
+                                    fig, ax = plt.subplots()
 
-                                temp = temp['satisfaction_group'].value_counts()
-                                custom_labels = ['Bad (1-5)', 'Neutral (5-7)', 'Good (7-10)']
-                                colors = ['red', 'yellow', 'green']
+                                    temp = temp.reindex(temp.index.categories, fill_value=0).sort_values(ascending=False)
+                                    custom_labels = ['Bad (1-5)', 'Neutral (5-7)', 'Good (7-10)']
+                                    colors = ['red', 'yellow', 'green']
 
 
-                                wedges, texts, autotexts = ax.pie(temp, 
-                                                                labels=custom_labels, 
-                                                                autopct='%1.1f%%', 
-                                                                startangle=90,
-                                                                colors=colors,
-                                                                textprops={'fontsize': 12, 'color': 'black'})
-                                ax.legend(wedges, custom_labels, title=None, loc="center left", bbox_to_anchor=(1, 0, 0.5, 1))
+                                    wedges, texts, autotexts = ax.pie(temp, 
+                                                                    labels=custom_labels, 
+                                                                    autopct='%1.1f%%', 
+                                                                    startangle=90,
+                                                                    colors=colors,
+                                                                    textprops={'fontsize': 12, 'color': 'black'})
+                                    ax.legend(wedges, custom_labels, title=None, loc="center left", bbox_to_anchor=(1, 0, 0.5, 1))
                                 
 
-                                ax.axis('equal')
+                                    ax.axis('equal')
 
-                                return ax
+                                    return ax
 
             with ui.nav_panel("Incoming and Departing"):
-                @render.plot
-                def plot_churn():
+                if _PLOTLY:
+                    @figures.render_figure
+                    @timed('render')
+                    def plot_churn():
+                        return figures.to_ui(figures.in_out(df_in_out), 'plot_churn_fig')
+                else:
+                    @cached_plot
+                    @timed('render')
+                    def plot_churn():
                     
-                    ax = df_in_out.plot(kind='bar', x='year')
+                        ax = df_in_out.plot(kind='bar', x='year')
 
-                    ax.legend(['Incoming', 'Departing'])
-                    ax.axvspan(-.5,2.5, facecolor=_HIGHLIGHT_COLOR, alpha=0.3)
-                    ax.set_xlabel('')
+                        ax.legend(['Incoming', 'Departing'])
+                        ax.axvspan(-.5,2.5, facecolor=_HIGHLIGHT_COLOR, alpha=0.3)
+                        ax.set_xlabel('')
 
-                    for c in ax.containers:
-                        ax.bar_label(c)
+                        for c in ax.containers:
+                            ax.bar_label(c)
 
-                    return ax
+                        return ax
 
                 ui.div(
                     ui.card_footer('*Company went public in 2017.'),
@@ -277,6 +567,45 @@ with ui.nav_panel("Deep Dive"):
                                     ui.input_action_button('predict', 'Predict!', width="100%"),
                                     style= "margin-top:2rem;"
                                 )
+
+                            #BATCH SCORING: same seven inputs as columns, one profile per row
+                            ui.input_file('batch_file', 'Score a CSV of profiles', accept=['.csv'], width="100%")
+
+                            batch_result = reactive.value(None)
+
+                            @reactive.effect
+                            @reactive.event(input.batch_file)
+                            @timed('effect')
+                            def score_batch():
+                                try:
+                                    batch_result.set(score_upload(input.batch_file()[0]['datapath'], threshold()))
+                                except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+                                    batch_result.set(str(e))
+
+                            @render.ui
+                            @timed('render')
+                            def batch_report():
+                                res = batch_result()
+                                if res is None:
+                                    return ui.tags.small('columns: last_evaluation, number_project, average_monthly_hours, time_spend_company, work_accident, promotion_last_5years, salary')
+                                if isinstance(res, str):
+                                    return ui.tags.small(f'Could not score the file: {res}', style="color: #DC143C;")
+
+                                _, stats = res
+                                return ui.tags.small(
+                                    '{rows} rows, {scored} scored, {rejected} rejected in {seconds:.2f}s '
+                                    '({rows_per_s:,.0f} rows/s, {batches} batches, p50 {batch_p50_ms:.1f}ms, max {batch_max_ms:.1f}ms)'.format(**stats)
+                                )
+
+                            @render.download(filename='scored_profiles.csv', label='download scores')
+                            @timed('render')
+                            def download_batch():
+                                res = batch_result()
+                                if res is None or isinstance(res, str):
+                                    return
+                                result, _ = res
+                                for start in range(0, max(len(result), 1), 10000):
+                                    yield result.iloc[start:start + 10000].to_csv(index=False, header=start == 0)
                             ui.div(
                                 ui.card_footer('*model created using XGBoost Classifier, achieving 97% accuracy on the test dataset'),
                                 style="font-weight: bold; font-style: italic;color: white; line-height: 0; text-align: right;"
@@ -293,26 +622,28 @@ with ui.nav_panel("Deep Dive"):
                                 )
 
                                 @render.ui
+                                @timed('render')
                                 def render_result_text():
                                     return result_text()
                                 
                                 @reactive.effect
                                 @reactive.event(input.predict)
+                                @timed('effect')
                                 def predict_result():
 
-                                    result = model.predict_proba(process_inputs(
-                                                                input.last_evaluation(),
-                                                                input.number_project(),
-                                                                input.average_monthly_hours(),
-                                                                input.time_spend_company(),
-                                                                input.work_accident(),
-                                                                input.promotion_last_5years(),
-                                                                input.salary()
-                                                                ))
-
-                                    no, yes = result[0]
-                                    color = '#DC143C' if yes > _THRESHOLD else '#32CD32'
-                                    num, word = (yes*100, 'leaving 😔')  if no < _THRESHOLD else (no*100, 'staying 😃')
+                                    yes = predict_profile(
+                                                    input.last_evaluation(),
+                                                    input.number_project(),
+                                                    input.average_monthly_hours(),
+                                                    input.time_spend_company(),
+                                                    input.work_accident(),
+                                                    input.promotion_last_5years(),
+                                                    input.salary()
+                                                    )
+                                    #the same Leaving/Staying rule as the counts and the table
+                                    leaving = leaving_label([yes], threshold())[0] == 'Leaving'
+                                    color = '#DC143C' if leaving else '#32CD32'
+                                    num, word = (yes*100, 'leaving 😔') if leaving else ((1 - yes)*100, 'staying 😃')
 
                                     txt = ui.tags.div(
                                         ui.tags.div(
@@ -334,25 +665,124 @@ with ui.nav_panel("Deep Dive"):
 
                             @reactive.effect
                             @reactive.event(input.predict)
+                            @timed('effect')
                             def explain():
-                                pos = [
-                                    ui.tags.h4('Happening most like due to (xxxxxxxxxx)'),
-                                    ui.tags.h4('Current reported satisfaction score (xxxxxxxxxx)'),
-                                    ui.tags.h4('Check on (xxxxxxxxxxxxxxx)'),
-                                    ui.tags.h4('Reduce (xxxxxxxx) to (xxxxxxxxxxxxx)'),
-                                    ui.tags.h4('Increase effort on (xxxxxxxxxxxxx)'),
-                                ]
-                                
-                                result_explanation.set(random.sample(pos, random.randint(1,len(pos))))
+                                #how far each input moves this profile's log-odds of leaving from the average
+                                contrib = explain_profile(
+                                                input.last_evaluation(),
+                                                input.number_project(),
+                                                input.average_monthly_hours(),
+                                                input.time_spend_company(),
+                                                input.work_accident(),
+                                                input.promotion_last_5years(),
+                                                input.salary()
+                                                )[:-1]
+                                top = [i for i in np.argsort(-np.abs(contrib), kind='stable')[:_EXPLAIN_TOP] if contrib[i] != 0]
+
+                                result_explanation.set([
+                                    ui.tags.h4(f'{_FEATURE_LABELS[i]} {"raises" if contrib[i] > 0 else "lowers"} the odds of leaving ({contrib[i]:+.2f})')
+                                    for i in top
+                                ] or [ui.tags.h4('No input moves this prediction from the average')])
 
                             with ui.card(full_screen=True, height="45%"):
                                 
                                 @render.ui
+                                @timed('render')
                                 def result_explanation_text():
                                     return ui.tags.div(
                                         *result_explanation()
                                     )
                                 
+                ############################################
+                #WHAT-IF SWEEP
+                ############################################
+                with ui.nav_panel(title='What-if Sweep'):
+                    with ui.layout_columns(col_widths=(3,9)):
+                        with ui.card(full_screen=True):
+                            ui.input_select('sweep_x', 'Vary', {k: v[0] for k, v in _SWEEP_INPUTS.items()})
+                            ui.input_select('sweep_y', 'Against', {'': 'Nothing (curve)', **{k: v[0] for k, v in _SWEEP_INPUTS.items()}})
+                            ui.input_numeric('sweep_steps', 'Grid Points per Input', _SWEEP_STEPS, min=2, max=_SWEEP_MAX_STEPS)
+                            ui.input_action_button('sweep', 'Sweep!', width="100%")
+                            ui.tags.small('the other inputs are the ones entered in the calculator')
+
+                        with ui.card(full_screen=True):
+
+                            #where a one-input sweep crosses t. salary only reaches the model as its band, so
+                            #its crossings are the 12M/20M edges rather than a point between grid values
+                            def sweep_crossings(name, x, probs, t):
+                                if name == 'salary':
+                                    return crossings(x, probs, t, edges=_SALARY_BINS)
+                                return crossings(x, probs, t, isinstance(_SWEEP_INPUTS[name][1], tuple))
+
+                            #the calculator profile with the chosen inputs over their grids, scored in one batch
+                            @reactive.calc
+                            @reactive.event(input.sweep)
+                            @timed('calc')
+                            def sweep_result():
+                                names = [input.sweep_x()]
+                                if input.sweep_y() and input.sweep_y() != input.sweep_x():
+                                    names.append(input.sweep_y())
+                                steps = min(max(int(input.sweep_steps() or _SWEEP_STEPS), 2), _SWEEP_MAX_STEPS)
+                                axes = {}
+                                for n in names:
+                                    grid = _SWEEP_INPUTS[n][1]
+                                    axes[n] = np.linspace(*grid, steps) if isinstance(grid, tuple) else grid
+
+                                start = time.perf_counter()
+                                probs = sweep_profile((
+                                                input.last_evaluation(),
+                                                input.number_project(),
+                                                input.average_monthly_hours(),
+                                                input.time_spend_company(),
+                                                input.work_accident(),
+                                                input.promotion_last_5years(),
+                                                input.salary()
+                                                ), axes)
+                                return axes, probs, time.perf_counter() - start
+
+                            @render.plot
+                            @timed('render')
+                            def sweep_plot():
+                                axes, probs, _ = sweep_result()
+                                names = list(axes)
+                                x = axes[names[0]].astype(float)
+                                t = threshold()
+
+                                fig, ax = plt.subplots(figsize=(16, 9))
+                                if len(names) == 1:
+                                    ax.plot(x, probs, color='#FFD700', marker='o' if len(x) <= 10 else None)
+                                    ax.axhline(t, color='#DC143C', linestyle='--', label=f'threshold ({t:.0%})')
+                                    for c in sweep_crossings(names[0], x, probs, t):
+                                        ax.axvline(c, color=_LIGHT_FONT, linestyle=':')
+                                        ax.annotate(f'{c:,.0f}', (c, t), xytext=(5, 5), textcoords='offset points')
+                                    ax.set_ylim(0, 1)
+                                    ax.set_ylabel('Probability of Leaving')
+                                    ax.legend(loc='upper left', frameon=False)
+                                else:
+                                    y = axes[names[1]].astype(float)
+                                    mesh = ax.pcolormesh(x, y, probs.T, shading='nearest', cmap='RdYlGn_r', vmin=0, vmax=1)
+                                    if probs.min() < t < probs.max() and len(x) > 1 and len(y) > 1:
+                                        ax.contour(x, y, probs.T, levels=[t], colors=_LIGHT_FONT, linewidths=2)
+                                    fig.colorbar(mesh, ax=ax, label='Probability of Leaving')
+                                    ax.set_ylabel(_SWEEP_INPUTS[names[1]][0])
+                                ax.ticklabel_format(style='plain', useOffset=False)
+                                ax.set_xlabel(_SWEEP_INPUTS[names[0]][0])
+                                ax.set_title('Probability of Leaving, threshold crossing marked')
+                                return ax
+
+                            @render.text
+                            @timed('render')
+                            def sweep_summary():
+                                axes, probs, seconds = sweep_result()
+                                names = list(axes)
+                                t = threshold()
+                                if len(names) == 1:
+                                    cross = sweep_crossings(names[0], axes[names[0]].astype(float), probs, t)
+                                    where = f'crosses {t:.0%} at ' + ', '.join(f'{c:,.0f}' for c in cross) if len(cross) else f'stays {"at or above" if probs[0] >= t else "below"} {t:.0%} over the whole range'
+                                else:
+                                    where = f'{(probs >= t).mean():.0%} of the grid is at or above {t:.0%}'
+                                return f'{where} ({probs.size:,} profiles scored in {seconds * 1000:.0f} ms)'
+
                 ############################################
                 #BREAKDOWN PANEL
                 ############################################
@@ -378,31 +808,54 @@ with ui.nav_panel("Deep Dive"):
 
                             @reactive.effect
                             @reactive.event(input.filter_both)
+                            @timed('effect')
                             def update_filters():
-                                ui.update_select('dept_2', selected = input.dept_3())
-                                ui.update_select('dept_1', selected = input.dept_3())
-                                ui.update_date_range('dt_rng_1', start=input.dt_rng_2()[0], end=input.dt_rng_2()[1])
-                                ui.update_slider('pct_slider_1', value=(input.pct_slider_2()[0], input.pct_slider_2()[1]))
-
-                                #SURVEY SIDE
-                                temp_df = df_survey.copy()
-
-                                if input.dept_3():
-                                    temp_df = temp_df[temp_df['Department'].isin(list(input.dept_3()))]
-
-                                temp_df = temp_df[temp_df['Date'].between(pd.to_datetime(input.dt_rng_2()[0]) or df_survey['Date'].min(),pd.to_datetime(input.dt_rng_2()[1]) or df_survey['Date'].max())]
-
-                                temp_df_survey.set(temp_df)
-
-                                #MAIN SIDE
-                                temp_df = beau_column_names()
-
-                                if input.dept_3():
-                                    temp_df = temp_df[temp_df['Department'].isin(list(input.dept_3()))]
-
-                                temp_df = temp_df[temp_df['Probability of Leaving'].between(input.pct_slider_2()[0]/100.0,input.pct_slider_2()[1]/100.0) | pd.isna(temp_df['Probability of Leaving'])]
+                                #both sides at once, without the Raw Data searches
+                                dates = (pd.to_datetime(input.dt_rng_2()[0]) or df_survey['Date'].min(),pd.to_datetime(input.dt_rng_2()[1]) or df_survey['Date'].max())
+                                depts = tuple(input.dept_3()) or None
+                                filters.write('filter_both',
+                                              main_depts=depts,
+                                              survey_depts=depts,
+                                              prob=(input.pct_slider_2()[0]/100.0,input.pct_slider_2()[1]/100.0),
+                                              dates=dates,
+                                              main_name='', main_id=None, survey_name='', survey_id=None, comments='')
+
+                            #SESSION MEMORY GAUGE: what this session holds next to what copying its filtered rows would take
+                            @reactive.calc
+                            @timed('calc')
+                            def held_bytes():
+                                return nbytes([sel_main(), sel_survey(), sel_main_depts(), batch_result()])
+
+                            #the same, per session at /metrics while it is open
+                            metrics.track_session(get_current_session(), held_bytes)
+
+                            @render.ui
+                            @timed('render')
+                            def session_memory():
+                                held = held_bytes()
+                                tables = table_bytes()
+                                copies = tables['employees'] * len(sel_main()) / max(len(employees()), 1) + tables['survey'] * len(sel_survey()) / max(len(df_survey), 1)
+
+                                return ui.tags.small(
+                                    f'session state {held / 1024:,.1f} KB, '
+                                    f'as filtered copies {copies / 1024:,.0f} KB '
+                                    f'(shared tables {(tables["employees"] + tables["survey"]) / 2**20:,.1f} MB)',
+                                    style="color: #999999;"
+                                )
 
-                                temp_df_main.set(temp_df)
+                            @render.ui
+                            @timed('render')
+                            def filter_stats():
+                                #the selections first, so the counts include this change
+                                sel_main(), sel_main_depts(), sel_survey(), sel_survey_spec()
+                                stats = filters.stats()
+                                last = ', '.join(f'{k} {v}' for k, v in sorted(stats['last_recomputes'].items())) or 'none'
+
+                                return ui.tags.small(
+                                    f'{stats["clicks"]:,} filter clicks, {stats["recomputes"]:,} recomputes'
+                                    + (f' (last {stats["last_click"]}: {last})' if stats['last_click'] else ''),
+                                    style="color: #999999;"
+                                )
 
 
                         with ui.navset_hidden(id="hidden_tabs"):
@@ -416,23 +869,27 @@ with ui.nav_panel("Deep Dive"):
                                     with ui.layout_columns(col_widths=(3,3,3,3)):
                                         with ui.card(fillable=True):
                                             @render.ui
+                                            @timed('render')
                                             def kpi1():
-                                                return kpi('Work-Life Balance', temp_df_survey()['Work-Life Balance'].mean())                                
+                                                return kpi('Work-Life Balance', survey_means()['Work-Life Balance'])                                
 
                                         with ui.card(fillable=True):
                                             @render.ui
+                                            @timed('render')
                                             def kpi2():
-                                                return kpi('Workload', temp_df_survey()['Workload'].mean())
+                                                return kpi('Workload', survey_means()['Workload'])
 
                                         with ui.card(fillable=True):
                                             @render.ui
+                                            @timed('render')
                                             def kpi3():
-                                                return kpi('Management', temp_df_survey()['Management'].mean())
+                                                return kpi('Management', survey_means()['Management'])
                                         
                                         with ui.card(fillable=True):
                                             @render.ui
+                                            @timed('render')
                                             def kpi4():
-                                                return kpi('Career Progression', temp_df_survey()['Growth Opportunities'].mean())
+                                                return kpi('Career Progression', survey_means()['Growth Opportunities'])
 
                                 with ui.card(fillable=True):
                                     with ui.layout_columns(col_widths=(4,8)):
@@ -443,6 +900,7 @@ with ui.nav_panel("Deep Dive"):
 
                                             @reactive.effect
                                             @reactive.event(input.filter_both)
+                                            @timed('effect')
                                             def randomise_best_worst():
                                                 dl = _DEPT_LIST.copy()
                                                 random.shuffle(dl)
@@ -451,6 +909,7 @@ with ui.nav_panel("Deep Dive"):
 
                                             with ui.card(fillable=True, height="50%"):
                                                 @render.ui
+                                                @timed('render')
                                                 def kpi5():
                                                     return ui.tags.div(
                                                         ui.tags.div(
@@ -463,6 +922,7 @@ with ui.nav_panel("Deep Dive"):
 
                                             with ui.card(fillable=True, height="50%"):
                                                 @render.ui
+                                                @timed('render')
                                                 def kpi6():
                                                     return ui.tags.div(
                                                         ui.tags.div(
@@ -474,15 +934,26 @@ with ui.nav_panel("Deep Dive"):
                                                     )
 
                                         with ui.card(fillable=True):
-                                            @render.plot
-                                            def kp():
-                                                temp_df = temp_df_survey().copy()
-                                                temp_df = temp_df[['Department', 'Work-Life Balance','Salary','Management','Workload','Growth Opportunities']].groupby('Department').mean().reset_index()
-
-                                                ax = temp_df.plot(kind='bar', x='Department')
-                                                ax.set_xlabel('')
-                                                ax.set_xticklabels(list(temp_df['Department'].unique()),rotation=45, ha='right')
-                                                return ax
+                                            if _PLOTLY:
+                                                @figures.render_figure
+                                                @timed('render')
+                                                def kp():
+                                                    return figures.to_ui(figures.survey_drivers(survey_drivers()), 'kp_fig')
+                                            else:
+                                                @cached_plot(state=survey_view)
+                                                @timed('render')
+                                                def kp():
+                                                    temp_df = survey_drivers()
+                                                    if temp_df.empty:
+                                                        fig, ax = plt.subplots()
+                                                        ax.text(.5, .5, 'No survey responses match the filters', ha='center', va='center', transform=ax.transAxes)
+                                                        ax.set_axis_off()
+                                                        return ax
+
+                                                    ax = temp_df.plot(kind='bar', x='Department')
+                                                    ax.set_xlabel('')
+                                                    ax.set_xticklabels(list(temp_df['Department'].unique()),rotation=45, ha='right')
+                                                    return ax
 
                             #################################################################
                             #EMPLOYEE BREAKDOWN
@@ -496,131 +967,134 @@ with ui.nav_panel("Deep Dive"):
 
                                             with ui.card(fillable=True, height=_HT):
                                                 with ui.card(fillable=True, height="47%"):
-                                                    _OVER_THRESHOLD = 240
-
                                                     @render.ui
+                                                    @timed('render')
                                                     def kpi7():
 
-                                                        ovw = temp_df_main()[eval(_MAIN_FILTER_NOT_GONE) & (temp_df_main()['Average Hours Worked (Monthly)'] >= _OVER_THRESHOLD)]['Employee ID'].count()
-                                                        total = temp_df_main()[eval(_MAIN_FILTER_NOT_GONE)]['Employee ID'].count()
-                                                        
-                                                        return kpi('% Overworked', ovw/total, pct=True)
+                                                        k = breakdown_kpis()
+                                                        return kpi('% Overworked', k['pct_overworked_present'], pct=True)
                                                     
                                                     ui.card_footer(f'*overworking defined as working more than {_OVER_THRESHOLD} hours a month')
 
                                                 with ui.card(fillable=True, height="53%"):
                                                     @render.ui
+                                                    @timed('render')
                                                     def kpi8():
 
-                                                        ovw = temp_df_main()[eval(_MAIN_FILTER_NOT_GONE) & (temp_df_main()['Average Hours Worked (Monthly)'] >= _OVER_THRESHOLD) & (temp_df_main()['salary_group'] == 1)]['Employee ID'].count()
-
-                                                        return kpi('Overworked & Underpaid', ovw, integer=True)
+                                                        k = breakdown_kpis()
+                                                        return kpi('Overworked & Underpaid', k['overworked_underpaid_present'], integer=True)
 
                                                     ui.card_footer(f'*salary classification adjusted to industry/title average on the particular year', style="font-size:.8rem;")
 
 
-                                            @render.plot
-                                            def work_hours_plot():
-                                                temp_df = temp_df_main()[eval(_MAIN_FILTER_NOT_GONE)].copy()
-
-                                                temp_df = temp_df[['Department','Leaving/Staying','Average Hours Worked (Monthly)']].groupby(['Department', 'Leaving/Staying']).median().reset_index()
-
-                                                ax = sns.barplot(data=temp_df, x='Department', y='Average Hours Worked (Monthly)', hue='Leaving/Staying', palette = {'Leaving': '#FF4500', 'Staying': '#32CD32'})
-
-                                                ax.set_title('Hours Worked per Employee per Month (Median)')
-                                                for bar in ax.patches:
-                                                    height = bar.get_height()
-                                                    ax.text(
-                                                        bar.get_x() + bar.get_width() / 2, 
-                                                        height,                            
-                                                        f'{height:.2f}',                    
-                                                        ha='center', va='bottom'           
-                                                    )
-                                                ax.set_xlabel(None)
-                                                ax.set_ylabel(None)
-                                                ax.legend(title=None)
-
-                                                return ax
-
-                                            @render.plot
-                                            def plot_salaries():
-                                                temp_df = df_salaries.copy()
-
-                                                fig, ax = plt.subplots(figsize=(16, 9))
+                                            if _PLOTLY:
+                                                @figures.render_figure
+                                                @timed('render')
+                                                def work_hours_plot():
+                                                    return figures.to_ui(figures.median_hours(median_hours()), 'work_hours_plot_fig')
+                                            else:
+                                                @cached_plot(state=lambda: (main_view(), threshold()))
+                                                @timed('render')
+                                                def work_hours_plot():
+                                                    temp_df = median_hours()
+
+                                                    ax = sns.barplot(data=temp_df, x='department', y='average_monthly_hours', hue='Leaving/Staying', palette = {'Leaving': '#FF4500', 'Staying': '#32CD32'})
+
+                                                    ax.set_title('Hours Worked per Employee per Month (Median)')
+                                                    for bar in ax.patches:
+                                                        height = bar.get_height()
+                                                        ax.text(
+                                                            bar.get_x() + bar.get_width() / 2, 
+                                                            height,                            
+                                                            f'{height:.2f}',                    
+                                                            ha='center', va='bottom'           
+                                                        )
+                                                    ax.set_xlabel(None)
+                                                    ax.set_ylabel(None)
+                                                    ax.legend(title=None)
+
+                                                    return ax
+
+                                            if _PLOTLY:
+                                                @figures.render_figure
+                                                @timed('render')
+                                                def plot_salaries():
+                                                    return figures.to_ui(figures.salaries(df_salaries), 'plot_salaries_fig')
+                                            else:
+                                                @cached_plot
+                                                @timed('render')
+                                                def plot_salaries():
+                                                    temp_df = df_salaries.copy()
+
+                                                    fig, ax = plt.subplots(figsize=(16, 9))
 
                                                 
-                                                ax.bar(temp_df['year'], temp_df['low'], label='Low', color='#FF4500')
-                                                ax.bar(temp_df['year'], temp_df['standard'], bottom=temp_df['low'], label='Standard', color = '#FFD700')
-                                                ax.bar(temp_df['year'], temp_df['high'], bottom=temp_df['low'] + temp_df['standard'], label='High', color='#32CD32')
+                                                    ax.bar(temp_df['year'], temp_df['low'], label='Low', color='#FF4500')
+                                                    ax.bar(temp_df['year'], temp_df['standard'], bottom=temp_df['low'], label='Standard', color = '#FFD700')
+                                                    ax.bar(temp_df['year'], temp_df['high'], bottom=temp_df['low'] + temp_df['standard'], label='High', color='#32CD32')
 
                                                 
-                                                for i in range(len(temp_df)):
+                                                    for i in range(len(temp_df)):
                                                 
-                                                    ax.text(temp_df['year'][i], temp_df['low'][i] / 2, f'{temp_df["low"][i] * 100:.0f}%', ha='center', va='center', color='#323232', fontsize=10)
+                                                        ax.text(temp_df['year'][i], temp_df['low'][i] / 2, f'{temp_df["low"][i] * 100:.0f}%', ha='center', va='center', color='#323232', fontsize=10)
                                                     
                                                    
-                                                    ax.text(temp_df['year'][i], temp_df['low'][i] + temp_df['standard'][i] / 2, f'{temp_df["standard"][i] * 100:.0f}%', ha='center', va='center', color='#323232', fontsize=10)
+                                                        ax.text(temp_df['year'][i], temp_df['low'][i] + temp_df['standard'][i] / 2, f'{temp_df["standard"][i] * 100:.0f}%', ha='center', va='center', color='#323232', fontsize=10)
                                                     
                                                    
-                                                    ax.text(temp_df['year'][i], temp_df['low'][i] + temp_df['standard'][i] + temp_df['high'][i] / 2, f'{temp_df["high"][i] * 100:.0f}%', ha='center', va='center', color='#323232', fontsize=10)
+                                                        ax.text(temp_df['year'][i], temp_df['low'][i] + temp_df['standard'][i] + temp_df['high'][i] / 2, f'{temp_df["high"][i] * 100:.0f}%', ha='center', va='center', color='#323232', fontsize=10)
 
                                                
-                                                ax.set_xlabel(None)
-                                                ax.set_xticks(temp_df['year'])
-                                                ax.set_xticklabels(temp_df['year'])
-                                                ax.set_ylabel(None)
-                                                ax.set_yticks([])
-                                                ax.set_title('Employees Salaries over the Years')
+                                                    ax.set_xlabel(None)
+                                                    ax.set_xticks(temp_df['year'])
+                                                    ax.set_xticklabels(temp_df['year'])
+                                                    ax.set_ylabel(None)
+                                                    ax.set_yticks([])
+                                                    ax.set_title('Employees Salaries over the Years')
 
                                              
-                                                ax.legend(loc='upper left', bbox_to_anchor=(0, 1.1), ncol=3, frameon=False)
-                                                return ax
+                                                    ax.legend(loc='upper left', bbox_to_anchor=(0, 1.1), ncol=3, frameon=False)
+                                                    return ax
 
                                             with ui.card(fillable=True, height=_HT):
                                                 with ui.card(fillable=True, height="47%"):
-                                                    _OVER_THRESHOLD = 240
-
                                                     @render.ui
+                                                    @timed('render')
                                                     def kpi9():
 
-                                                        ovw = temp_df_main()[temp_df_main()['Average Hours Worked (Monthly)'] >= _OVER_THRESHOLD]['Employee ID'].count()
-                                                        total = temp_df_main()['Employee ID'].count()
-                                                        
-                                                        return kpi('% Overworked', ovw/total, pct=True)
+                                                        k = breakdown_kpis()
+                                                        return kpi('% Overworked', k['pct_overworked'], pct=True)
                                                     
                                                     ui.card_footer(f'*overworking defined as working more than {_OVER_THRESHOLD} hours a month')
 
                                                 with ui.card(fillable=True, height="53%"):
                                                     @render.ui
+                                                    @timed('render')
                                                     def kpi10():
 
-                                                        ovw = temp_df_main()[eval(_MAIN_FILTER_NOT_GONE) & (temp_df_main()['Average Hours Worked (Monthly)'] >= _OVER_THRESHOLD) & (temp_df_main()['salary_group'] == 1)]['Employee ID'].count()
-
-                                                        return kpi('Overworked & Underpaid', ovw, integer=True)
+                                                        k = breakdown_kpis()
+                                                        return kpi('Overworked & Underpaid', k['overworked_underpaid_present'], integer=True)
 
                                                     ui.card_footer(f'*salary classification adjusted to industry/title average on the particular year', style="font-size:.8rem;")
                                             
                                             with ui.card(fillable=True, height=_HT):
                                                 with ui.card(fillable=True, height="47%"):
-                                                    _OVER_THRESHOLD = 240
-
                                                     @render.ui
+                                                    @timed('render')
                                                     def kpi11():
 
-                                                        ovw = temp_df_main()[temp_df_main()['Average Hours Worked (Monthly)'] >= _OVER_THRESHOLD]['Employee ID'].count()
-                                                        total = temp_df_main()['Employee ID'].count()
-                                                        
-                                                        return kpi('% Overworked', ovw/total, pct=True)
+                                                        k = breakdown_kpis()
+                                                        return kpi('% Overworked', k['pct_overworked'], pct=True)
                                                     
                                                     ui.card_footer(f'*overworking defined as working more than {_OVER_THRESHOLD} hours a month')
 
                                                 with ui.card(fillable=True, height="53%"):
                                                     @render.ui
+                                                    @timed('render')
                                                     def kpi12():
 
-                                                        ovw = temp_df_main()[eval(_MAIN_FILTER_NOT_GONE) & (temp_df_main()['Average Hours Worked (Monthly)'] >= _OVER_THRESHOLD) & (temp_df_main()['salary_group'] == 1)]['Employee ID'].count()
-
-                                                        return kpi('Overworked & Underpaid', ovw, integer=True)
+                                                        k = breakdown_kpis()
+                                                        return kpi('Overworked & Underpaid', k['overworked_underpaid_present'], integer=True)
 
                                                     ui.card_footer(f'*salary classification adjusted to industry/title average on the particular year', style="font-size:.8rem;")
                                                     
@@ -628,31 +1102,37 @@ with ui.nav_panel("Deep Dive"):
                                                     
 
 
-                                            @render.plot
-                                            def plot123():
-                                                temp_df = temp_df_main().copy()
+                                            if _PLOTLY:
+                                                @figures.render_figure
+                                                @timed('render')
+                                                def plot123():
+                                                    return figures.to_ui(figures.mean_hours(mean_hours(), colors), 'plot123_fig')
+                                            else:
+                                                @cached_plot(state=main_view)
+                                                @timed('render')
+                                                def plot123():
+                                                    temp_df = mean_hours()
 
-                                                temp_df = temp_df[['Department','Average Hours Worked (Monthly)']].groupby('Department').mean().reset_index()
+                                                    ax = sns.barplot(data=temp_df, palette=colors, x='department', y='average_monthly_hours')
 
-                                                ax = sns.barplot(data=temp_df, palette=colors, x='Department', y='Average Hours Worked (Monthly)')
+                                                    ax.set_title('Average Hours Worked per Employee per Month')
+                                                    for bar in ax.patches:
+                                                        height = bar.get_height()
+                                                        ax.text(
+                                                            bar.get_x() + bar.get_width() / 2, 
+                                                            height,                            
+                                                            f'{height:.2f}',                    
+                                                            ha='center', va='bottom'           
+                                                        )
+                                                    ax.set_xlabel(None)
+                                                    ax.set_ylabel(None)
 
-                                                ax.set_title('Average Hours Worked per Employee per Month')
-                                                for bar in ax.patches:
-                                                    height = bar.get_height()
-                                                    ax.text(
-                                                        bar.get_x() + bar.get_width() / 2, 
-                                                        height,                            
-                                                        f'{height:.2f}',                    
-                                                        ha='center', va='bottom'           
-                                                    )
-                                                ax.set_xlabel(None)
-                                                ax.set_ylabel(None)
-
-                                                return ax
+                                                    return ax
 
 
                         @reactive.effect
                         @reactive.event(input.tabs)
+                        @timed('effect', 'hidden_tabs')
                         def _():
                             ui.update_navs("hidden_tabs", selected=input.tabs())
 
@@ -681,82 +1161,80 @@ with ui.nav_panel("Raw Data"):
 
                         ui.input_action_button('filter_main', 'Apply Filter')
 
-                    with ui.card(fillable=True, max_height='4.5rem'): 
-                        
-                        @render.download(filename='employee_data.csv', label='export to csv')
-                        def download_main():
-                            
-                            if input.include_gone():
-                                yield temp_df_main().drop(columns=_COLS_TO_DROP).to_csv(index=False)
-                            else:
-                                yield temp_df_main()[(eval(_MAIN_FILTER_NOT_GONE))].drop(columns=_COLS_TO_DROP).to_csv(index=False)
+                    with ui.card(fillable=True, max_height='8rem'): 
+
+                        ui.input_select('export_main', None, EXPORT_FORMATS)
+
+                        #streamed _EXPORT_BATCH rows at a time, in the table's order
+                        @render.download(filename=lambda: f'employee_data.{input.export_main()}', label='export')
+                        @timed('render')
+                        async def download_main():
+                            async for chunk in in_thread(export_chunks(input.export_main(), employees(), main_rows(), _MAIN_TABLE_COLS, beau_column_names, _EXPORT_BATCH)):
+                                yield chunk
                         
                 @reactive.effect
                 @reactive.event(input.filter_main)
+                @timed('effect')
                 def apply_filter_main():
-                    temp_df = beau_column_names()
-
-                    input_list = {
-                                'Employee Name': input.name_1(),
-                                'Employee ID': input.id_1()
-                                }
-
-                    ui.update_checkbox_group('dept_3', selected = input.dept_1())
-                    ui.update_checkbox_group('dept_2', selected = input.dept_1())
-                    ui.update_slider('pct_slider_2', value=(input.pct_slider_1()[0], input.pct_slider_1()[1]))
-
-
-                    filters = ' & '.join([f"(temp_df['{k}'].astype(str).str.contains('{v}', case=False))" for k,v in input_list.items() if pd.notna(v)])
-                    filters+=f" & (temp_df['Probability of Leaving'].between({input.pct_slider_1()[0]/100.0},{input.pct_slider_1()[1]/100.0}) | pd.isna(temp_df['Probability of Leaving']))"
-    
-
-
-                    if input.dept_1():
-                        temp_df = temp_df[temp_df['Department'].isin(list(input.dept_1()))]
-                        temp_df_survey.set(temp_df_survey()[temp_df_survey()['Department'].isin(list(input.dept_1()))])
-
-                    temp_df = temp_df[eval(filters)]
-
-                    temp_df_main.set(temp_df)
+                    #no department ticked is every employee and leaves the survey side as it is,
+                    #ticked ones narrow the survey side too
+                    depts = tuple(input.dept_1())
+                    filters.write('filter_main',
+                                  **({'main_depts': depts, 'survey_depts': depts} if depts else {'main_depts': None}),
+                                  prob=(input.pct_slider_1()[0]/100.0,input.pct_slider_1()[1]/100.0),
+                                  main_name=input.name_1(),
+                                  main_id=search_id(input.id_1()))
 
 
 
                 with ui.card(fillable=True):
 
-                    ui.div(
-                        ui.card_header('*showing maximum of 100 rows'),
-                        style="font-weight: bold; font-style: italic;background-color: black; color: white; margin-bottom:-15px; width: 100%; text-align: right;"
-                    )
-
-                    @render.table
+                    with ui.div(style=_PAGER_STYLE):
+                        ui.input_select('sort_main', None, {'': 'Unsorted', **{c: DISPLAY_NAMES[c] for c in _MAIN_TABLE_COLS}}, width='16rem')
+                        ui.input_switch('desc_main', 'Descending')
+                        ui.input_action_button('prev_main', '‹')
+                        ui.input_numeric('page_main', None, 1, min=1, width='7rem')
+                        ui.input_action_button('next_main', '›')
+
+                        @render.text
+                        @timed('render')
+                        def rows_main():
+                            return page_label(len(main_rows()), input.page_main())
+
+                    #rows of the table in display order, a page is a slice of them
+                    @reactive.calc
+                    @timed('calc')
+                    def main_rows():
+                        rows = sel_main()
+                        if not input.include_gone():
+                            rows = rows[not_gone(rows)]
+                        return employee_sort().sort(rows, input.sort_main() or None, input.desc_main())
+
+                    @reactive.effect
+                    @reactive.event(main_rows)
+                    @timed('effect')
+                    def first_page_main():
+                        ui.update_numeric('page_main', value=1)
+
+                    @reactive.effect
+                    @reactive.event(input.prev_main)
+                    @timed('effect')
+                    def prev_page_main():
+                        ui.update_numeric('page_main', value=max((input.page_main() or 1) - 1, 1))
+
+                    @reactive.effect
+                    @reactive.event(input.next_main)
+                    @timed('effect')
+                    def next_page_main():
+                        ui.update_numeric('page_main', value=min((input.page_main() or 1) + 1, page_count(len(main_rows()), _PAGE_SIZE)))
+
+                    @render.ui
+                    @timed('render')
                     def plot_df_main():
-                        def highlight_rows(row):
-                            color = 'background-color: #DC143C' if row['Probability of Leaving'] > _THRESHOLD else ''
-                            return [color] * len(row)
-                        
-                        temp_df = temp_df_main() if input.include_gone() else temp_df_main()[eval(_MAIN_FILTER_NOT_GONE)]
-
-
-                        return (
-                            temp_df.drop(columns = _COLS_TO_DROP).head(100).style.set_table_attributes(
-                                    'class="dataframe shiny-table table w-auto"'
-                                )
-                                .hide(axis="index")
-                                .format(
-                                    {
-                                        "Satisfaction Score": "{0:0.2f}",
-                                        "Years since Onboarding": "{0:0.2f}",
-                                        "Last Evaluation Score": "{0:0.2f}",
-                                        "Salary": "{0:,}",
-                                        "Probability of Leaving": lambda x: "{:.2%}".format(x) if not pd.isna(x) else "N/A",
-                                        "Average Hours Worked (Monthly)": "{0:.0f}",
-
-                                    },
-                                )
-                                .set_table_styles(
-                                    [dict(selector="th", props=[("text-align", "left")])]
-                                ).apply(highlight_rows, axis=1)
-                            )
+                        page = page_rows(main_rows(), (input.page_main() or 1) - 1, _PAGE_SIZE)
+                        temp_df = beau_column_names(take(employees(), page)[_MAIN_TABLE_COLS])
+                        leaving = (temp_df['Probability of Leaving'] >= threshold()).fillna(False).to_numpy()
+                        return ui.HTML(page_html(temp_df, _MAIN_TABLE_FORMATS, leaving))
                             
       
         ######################################
@@ -769,52 +1247,87 @@ with ui.nav_panel("Raw Data"):
 
                         ui.input_text('name_2', 'Employee Name')
                         ui.input_numeric('id_2', 'Employee ID', None)
+                        ui.input_text('comments_2', 'Comments', placeholder='overtime "work-life balance"')
                         ui.input_date_range('dt_rng_1', 'Date Range', start=df_survey['Date'].min(), end=df_survey['Date'].max(), min=df_survey['Date'].min(), max=df_survey['Date'].max())
                         ui.input_checkbox_group('dept_2', 'Department', _DEPT_LIST, selected=_DEPT_LIST)
                         ui.input_action_button('filter_survey', 'Apply Filter')
 
-                    with ui.card(fillable=True, max_height='4.5rem'):
-                        @render.download(filename='survey_data.csv', label='export to csv')
-                        def download_survey():
-                            yield temp_df_survey().to_csv(index=False)
+                    with ui.card(fillable=True, max_height='8rem'):
+
+                        ui.input_select('export_survey', None, EXPORT_FORMATS)
+
+                        @render.download(filename=lambda: f'survey_data.{input.export_survey()}', label='export')
+                        @timed('render')
+                        async def download_survey():
+                            async for chunk in in_thread(export_chunks(input.export_survey(), df_survey, survey_rows(), batch_size=_EXPORT_BATCH)):
+                                yield chunk
 
 
                 @reactive.effect
                 @reactive.event(input.filter_survey)
+                @timed('effect')
                 def apply_filter_survey():
-                    temp_df = df_survey.copy()
-
-                    input_list = {
-                        'Employee Name': input.name_2(),
-                        'Employee ID': input.id_2(),
-                    }
-
-                    ui.update_checkbox_group('dept_1', selected = input.dept_2())
-                    ui.update_checkbox_group('dept_3', selected = input.dept_2())
-
-                    ui.update_date_range('dt_rng_2', start=input.dt_rng_1()[0], end=input.dt_rng_1()[1])
-
-
-                    filters = ' & '.join([f"(temp_df['{k}'].astype(str).str.contains('{v}', case=False))" for k, v in input_list.items() if pd.notna(v)])
-                    filters += f" & (temp_df['Department'].isin({list(input.dept_2())}))" if not input.dept_2() else ''
+                    dates = (pd.to_datetime(input.dt_rng_1()[0]) or df_survey['Date'].min(),pd.to_datetime(input.dt_rng_1()[1]) or df_survey['Date'].max())
+                    #no department ticked matches no response and leaves the employee side as it is,
+                    #ticked ones narrow the employee side too
+                    depts = tuple(input.dept_2())
+                    filters.write('filter_survey',
+                                  **({'survey_depts': depts, 'main_depts': depts} if depts else {'survey_depts': ()}),
+                                  dates=dates,
+                                  survey_name=input.name_2(),
+                                  survey_id=search_id(input.id_2()),
+                                  comments=input.comments_2())
 
-                    if input.dept_2():
-                        temp_df = temp_df[temp_df['Department'].isin(list(input.dept_2()))]
-                        temp_df_main.set(temp_df_main()[temp_df_main()['Department'].isin(list(input.dept_2()))])
-
-                    temp_df = temp_df[eval(filters) & temp_df['Date'].between(pd.to_datetime(input.dt_rng_1()[0]) or df_survey['Date'].min(),pd.to_datetime(input.dt_rng_1()[1]) or df_survey['Date'].max())]
+                with ui.card(fillable=True):
 
-                    temp_df_survey.set(temp_df)
+                    with ui.div(style=_PAGER_STYLE):
+                        ui.input_select('sort_survey', None, {'': 'Unsorted', **{c: c for c in df_survey.columns}}, width='16rem')
+                        ui.input_switch('desc_survey', 'Descending')
+                        ui.input_action_button('prev_survey', '‹')
+                        ui.input_numeric('page_survey', None, 1, min=1, width='7rem')
+                        ui.input_action_button('next_survey', '›')
+
+                        @render.text
+                        @timed('render')
+                        def rows_survey():
+                            return page_label(len(survey_rows()), input.page_survey())
+
+                    @reactive.calc
+                    @timed('calc')
+                    def survey_rows():
+                        return survey_sort.sort(sel_survey(), input.sort_survey() or None, input.desc_survey())
+
+                    @reactive.effect
+                    @reactive.event(survey_rows)
+                    @timed('effect')
+                    def first_page_survey():
+                        ui.update_numeric('page_survey', value=1)
+
+                    @reactive.effect
+                    @reactive.event(input.prev_survey)
+                    @timed('effect')
+                    def prev_page_survey():
+                        ui.update_numeric('page_survey', value=max((input.page_survey() or 1) - 1, 1))
+
+                    @reactive.effect
+                    @reactive.event(input.next_survey)
+                    @timed('effect')
+                    def next_page_survey():
+                        ui.update_numeric('page_survey', value=min((input.page_survey() or 1) + 1, page_count(len(survey_rows()), _PAGE_SIZE)))
+
+                    @render.ui
+                    @timed('render')
+                    def plot_df_survey():
+                        page = page_rows(survey_rows(), (input.page_survey() or 1) - 1, _PAGE_SIZE)
+                        return ui.HTML(page_html(take(df_survey, page), _SURVEY_TABLE_FORMATS))
 
                 with ui.card(fillable=True):
+                    ui.card_header('Most mentioned in comments')
 
-                    ui.div(
-                        ui.card_header('*showing maximum of 100 rows'),
-                        style="font-weight: bold; font-style: italic;background-color: black; color: white; margin-bottom:-15px; width: 100%; text-align: right;"
-                    )
-
-                    @render.table
-                    def plot_df_survey():
-                        return temp_df_survey().head(100)
+                    #counted from the comment index, one mention per response
+                    @render.ui
+                    @timed('render')
+                    def comment_terms():
+                        return ui.HTML(page_html(comment_index.term_counts(sel_survey())))
                     
                     
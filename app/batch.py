@@ -0,0 +1,107 @@
+import logging
+import time
+import numpy as np
+import pandas as pd
+from features import featurize, leaving_label
+
+
+log = logging.getLogger(__name__)
+
+#CALCULATOR INPUTS A BATCH FILE NEEDS -> RAW EXTRACT COLUMN featurize() READS THEM FROM
+_INPUTS = {
+            'last_evaluation': 'last_evaluation',
+            'number_project': 'number_project',
+            'average_monthly_hours': 'average_monthly_hours',
+            'time_spend_company': 'time_spend_company',
+            'work_accident': 'work_accident',
+            'promotion_last_5years': 'promotion_last_5years',
+            'salary': 'salary_amount'
+}
+
+_FLAGS_COLS = ['work_accident', 'promotion_last_5years']
+_FLAGS = {'true': True, 'false': False, 'yes': True, 'no': False, '1': True, '0': False, '1.0': True, '0.0': False}
+
+#same limits as the calculator's inputs, None is unbounded
+_BOUNDS = {
+            'last_evaluation': (0, 10),
+            'number_project': (0, None),
+            'average_monthly_hours': (0, None),
+            'time_spend_company': (0, None),
+            'salary': (0, None)
+}
+
+
+def _flag(col):
+    return col.astype(str).str.strip().str.lower().map(_FLAGS)
+
+
+#ONE BATCH OF UPLOADED ROWS -> RAW COLUMNS featurize() ACCEPTS, AND A REASON PER ROW IT CANNOT SCORE ('' IF IT CAN)
+def validate(chunk):
+    raw = pd.DataFrame(index=chunk.index)
+    errors = np.full(len(chunk), '', dtype=object)
+
+    def reject(mask, reason):
+        mask = np.asarray(mask, dtype=bool) & (errors == '')
+        errors[mask] = reason
+
+    for name, col in _INPUTS.items():
+        if name in _FLAGS_COLS:
+            values = _flag(chunk[name])
+            reject(values.isna(), f'{name} is not true/false')
+            raw[col] = values.eq(True).to_numpy()
+        else:
+            values = pd.to_numeric(chunk[name], errors='coerce')
+            reject(values.isna(), f'{name} is not a number')
+            lo, hi = _BOUNDS[name]
+            if lo is not None:
+                reject(values < lo, f'{name} is below {lo}')
+            if hi is not None:
+                reject(values > hi, f'{name} is above {hi}')
+            raw[col] = values
+
+    return raw, errors
+
+
+#SCORE AN UPLOADED CSV batch_size ROWS AT A TIME
+#predict maps model features to leaving probabilities. returns the uploaded rows plus
+#prob, Leaving/Staying and error columns, and throughput/latency figures for the run
+def score_file(path, predict, threshold, batch_size):
+    missing = [c for c in _INPUTS if c not in pd.read_csv(path, nrows=0).columns]
+    if missing:
+        raise ValueError(f'missing column(s): {", ".join(missing)}')
+
+    start = time.perf_counter()
+    parts, latency = [], []
+
+    for chunk in pd.read_csv(path, chunksize=batch_size):
+        t = time.perf_counter()
+        raw, errors = validate(chunk)
+        ok = errors == ''
+
+        prob = np.full(len(chunk), np.nan)
+        if ok.any():
+            prob[ok] = predict(featurize(raw[ok]))
+
+        chunk['prob'] = prob
+        chunk['Leaving/Staying'] = leaving_label(prob, threshold)
+        chunk['error'] = errors
+        parts.append(chunk)
+        latency.append(time.perf_counter() - t)
+
+    result = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=list(_INPUTS) + ['prob', 'Leaving/Staying', 'error'])
+    elapsed = time.perf_counter() - start
+    latency = np.array(latency or [0.0]) * 1000
+
+    stats = {
+        'rows': len(result),
+        'scored': int((result['error'] == '').sum()),
+        'rejected': int((result['error'] != '').sum()),
+        'seconds': elapsed,
+        'rows_per_s': len(result) / max(elapsed, 1e-9),
+        'batches': len(parts),
+        'batch_p50_ms': float(np.percentile(latency, 50)),
+        'batch_max_ms': float(latency.max()),
+    }
+    log.info('batch scored %(rows)d rows (%(rejected)d rejected) in %(seconds).2fs, %(rows_per_s).0f rows/s, batch p50 %(batch_p50_ms).1fms', stats)
+
+    return result, stats
@@ -0,0 +1,62 @@
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from features import featurize, gone_mask, leaving_label
+
+
+#FEATURIZE + GONE MASK + LABELS ON THE EXTRACT TILED UP TO EACH SIZE
+#python bench/bench_features.py [rows ...], 15k, 1M and 10M by default. the row-wise
+#apply it replaced is timed too up to _ROWWISE_MAX rows
+_SIZES = [15000, 1000000, 10000000]
+_ROWWISE_MAX = 15000
+
+
+def transform_row(row):
+    return {
+        'last_evaluation': row['last_evaluation'] / 10.0,
+        'work_accident': 1 if row['work_accident'] else 0,
+        'number_project': row['number_project'],
+        'average_monthly_hours': row['average_monthly_hours'],
+        'time_spend_company': row['time_spend_company'],
+        'promotion_last_5years': 1 if row['promotion_last_5years'] else 0,
+        'salary': 0 if row['salary_amount'] < 12000000 else 1 if row['salary_amount'] < 20000000 else 2
+    }
+
+
+def vectorized(df, prob):
+    features = featurize(df)
+    prob = prob.copy()
+    prob[gone_mask(df)] = np.nan
+    return features, leaving_label(prob, 0.6)
+
+
+def rowwise(df, prob):
+    features = df.apply(transform_row, axis=1, result_type='expand')
+    prob = df.assign(prob=prob).apply(lambda x: None if x['gone'] else x['prob'], axis=1)
+    return features, prob.apply(lambda x: 'Staying' if x < 0.6 else 'Leaving' if pd.notna(x) else None)
+
+
+def best_of(fn, *args, repeat=3):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - t)
+    return min(times)
+
+
+if __name__ == '__main__':
+    sizes = [int(s) for s in sys.argv[1:]] or _SIZES
+    raw = pd.read_csv(Path(__file__).resolve().parent.parent / 'rawraw.csv', dtype={'average_monthly_hours': float, 'last_evaluation': float, 'time_spend_company': float, 'salary': int})
+
+    for n in sizes:
+        df = raw.iloc[np.arange(n) % len(raw)].reset_index(drop=True)
+        prob = np.random.default_rng(0).random(n)
+        line = f'{n:>10,} rows  vectorized {best_of(vectorized, df, prob) * 1000:9.1f} ms'
+        if n <= _ROWWISE_MAX:
+            line += f'  row-wise {best_of(rowwise, df, prob, repeat=1) * 1000:9.1f} ms'
+        print(line, flush=True)
@@ -0,0 +1,72 @@
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from filters import EmployeeIndex, SurveyIndex
+
+
+#FILTER INDEX QUERIES AGAINST PANDAS MASKS, ON THE EXTRACT AND SURVEY TILED TO EACH SIZE
+#python bench/bench_filters.py [rows ...], 1M by default. every query is checked against the
+#mask it replaces before it is timed
+_SIZES = [1000000]
+_APP = Path(__file__).resolve().parent.parent
+
+
+def best_of(fn, repeat=20):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return min(times)
+
+
+def employees(n):
+    raw = pd.read_csv(_APP / 'rawraw.csv', usecols=['department', 'gone'])
+    df = raw.iloc[np.arange(n) % len(raw)].reset_index(drop=True)
+    df['department'] = df['department'].astype('category')
+    prob = np.random.default_rng(0).random(n)
+    prob[df['gone'].to_numpy(dtype=bool)] = np.nan
+    df['prob'] = prob
+    return df
+
+
+def survey(n):
+    raw = pd.read_csv(_APP / 'survey.csv', usecols=['Department', 'Date'])
+    df = raw.iloc[np.arange(n) % len(raw)].reset_index(drop=True)
+    df['Department'] = df['Department'].astype('category')
+    df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y')
+    return df
+
+
+def report(name, index_query, pandas_query):
+    assert np.array_equal(index_query(), pandas_query()), name
+    print(f'  {name:<34} index {best_of(index_query) * 1000:8.3f} ms   pandas {best_of(pandas_query, 5) * 1000:8.3f} ms', flush=True)
+
+
+if __name__ == '__main__':
+    for n in [int(s) for s in sys.argv[1:]] or _SIZES:
+        df = employees(n)
+        index = EmployeeIndex(df)
+        depts = list(df['department'].cat.categories[:3])
+        prob_ok = lambda lo, hi: df['prob'].isna() | df['prob'].between(lo, hi)
+        print(f'{n:,} employees')
+
+        report('departments (bitmap only)', lambda: index.departments(depts), lambda: np.packbits(df['department'].isin(depts).to_numpy()))
+        report('departments -> rows', lambda: index.select(depts), lambda: np.flatnonzero(df['department'].isin(depts)))
+        report('probability 20-80% (bitmap only)', lambda: index.prob_between(0.2, 0.8), lambda: np.packbits(prob_ok(0.2, 0.8).to_numpy()))
+        report('probability 20-80% -> rows', lambda: index.select(None, (0.2, 0.8)), lambda: np.flatnonzero(prob_ok(0.2, 0.8)))
+        report('departments + probability -> rows', lambda: index.select(depts, (0.2, 0.8)), lambda: np.flatnonzero(df['department'].isin(depts) & prob_ok(0.2, 0.8)))
+
+        sv = survey(n)
+        sindex = SurveyIndex(sv)
+        dates = (pd.Timestamp('2023-03-01'), pd.Timestamp('2023-09-30'))
+        sdepts = list(sv['Department'].cat.categories[:3])
+        print(f'{n:,} survey responses')
+
+        report('dates (bitmap only)', lambda: sindex.mask(sindex.dates_between(*dates)), lambda: sv['Date'].between(*dates).to_numpy())
+        report('dates -> rows', lambda: sindex.select(None, dates), lambda: np.flatnonzero(sv['Date'].between(*dates)))
+        report('departments + dates -> rows', lambda: sindex.select(sdepts, dates), lambda: np.flatnonzero(sv['Department'].isin(sdepts) & sv['Date'].between(*dates)))
@@ -0,0 +1,68 @@
+import pickle
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import shared
+from batch import score_file, _INPUTS
+from features import featurize
+from ingest import score_csv
+
+
+#THE COMPILED MODEL AGAINST xgboost'S predict_proba, ALONE AND INSIDE THE CSV SCORING PATHS
+#python bench/bench_scoring.py [rows ...], 1M by default. the extract is tiled to each size and
+#written to temporary CSVs for score_csv (chunked ingest) and score_file (batch upload).
+#the xgboost rows need the pickles' libraries and are skipped without them
+_SIZES = [1000000]
+_APP = Path(__file__).resolve().parent.parent
+
+
+def rows_per_s(fn, n, repeat=3):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return n / min(times)
+
+
+def xgboost_predict():
+    try:
+        with open(_APP / 'model.pkl', 'rb') as f:
+            model = pickle.load(f)
+    except ImportError:
+        return None
+    return lambda features: model.predict_proba(shared.compiled.transform(features))[:, 1]
+
+
+if __name__ == '__main__':
+    xgb = xgboost_predict()
+    raw = pd.read_csv(_APP / 'rawraw.csv')
+
+    for n in [int(s) for s in sys.argv[1:]] or _SIZES:
+        df = raw.iloc[np.arange(n) % len(raw)].reset_index(drop=True)
+        features = featurize(df)
+        print(f'{n:,} rows')
+
+        scorers = [('compiled', shared.compiled.predict)] + ([('xgboost', xgb)] if xgb else [])
+        for name, predict in scorers:
+            print(f'  model alone        {name:<9} {rows_per_s(lambda: predict(features), n):12,.0f} rows/s', flush=True)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path, upload_path = Path(tmp) / 'employees.csv', Path(tmp) / 'upload.csv'
+            df.to_csv(path, index=False)
+            df.rename(columns={col: name for name, col in _INPUTS.items()})[list(_INPUTS)].to_csv(upload_path, index=False)
+
+            for name, predict in scorers:
+                shared.predict_leaving, compiled_predict = predict, shared.predict_leaving
+                try:
+                    ingest = rows_per_s(lambda: score_csv(path, shared.score_employees, shared._CHUNK_SIZE, dtype=shared._RAW_DTYPES), n, 1)
+                finally:
+                    shared.predict_leaving = compiled_predict
+                upload = rows_per_s(lambda: score_file(upload_path, predict, shared._THRESHOLD, shared._BATCH_SIZE), n, 1)
+                print(f'  score_csv          {name:<9} {ingest:12,.0f} rows/s', flush=True)
+                print(f'  score_file         {name:<9} {upload:12,.0f} rows/s', flush=True)
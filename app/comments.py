@@ -0,0 +1,165 @@
+import re
+import numpy as np
+import pandas as pd
+
+
+#INVERTED INDEX OVER SURVEY COMMENTS
+#comments repeat a lot, so each distinct text is tokenized once and rows point at their text.
+#postings map a term to (text, position) pairs sorted by term, positions make phrase queries
+#possible. new responses are added as a segment of postings for the texts not seen before,
+#queries read every segment, so nothing already indexed is rebuilt
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+#terms left out of the per-department summaries (still searchable)
+_STOPWORDS = frozenset('''
+    a about after all also am an and any are as at be been being but by can could did do does
+    doesn't don't for from had has have he her here i i've if in into is it it's its just me
+    more most much my no not of on or our out over so some such than that the their them there
+    there's these they this those to too up very was we were what when where which while who
+    why will with would you your
+'''.split())
+#positions per text kept below this, key of a (text, position) pair is text * _SPAN + position
+_SPAN = 1 << 20
+
+
+def tokenize(text):
+    return _TOKEN.findall(str(text).lower().replace('’', "'"))
+
+
+#"quoted phrases" and single words, every part has to match
+def parse_query(q):
+    parts = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', q):
+        tokens = tokenize(phrase if phrase else word)
+        if tokens:
+            parts.append(tokens)
+    return parts
+
+
+class _Segment:
+
+    #texts get ids base, base + 1, ... in order, terms are numbered in vocab (shared by segments)
+    def __init__(self, texts, base, vocab):
+        #the same normalization as tokenize, over the whole batch at once
+        tokens = pd.Series(texts, dtype=object).str.lower().str.replace('’', "'", regex=False).str.findall(_TOKEN).explode().dropna()
+        pos = tokens.groupby(level=0).cumcount().to_numpy()
+        codes, self.terms = pd.factorize(tokens.to_numpy(), sort=True)
+        order = np.argsort(codes, kind='stable')
+
+        self.offsets = np.searchsorted(codes[order], np.arange(len(self.terms) + 1))
+        self.text = (base + tokens.index.to_numpy()[order]).astype(np.int32)
+        self.pos = pos[order].astype(np.int32)
+        self.term_ids = np.array([vocab.setdefault(t, len(vocab)) for t in self.terms], dtype=np.int32)
+
+        #the distinct non-stopword terms of every text, grouped by text, what the summaries count
+        term = np.repeat(self.term_ids, np.diff(self.offsets))
+        counted = np.repeat(np.array([t not in _STOPWORDS for t in self.terms], dtype=bool), np.diff(self.offsets))
+        by_text = np.lexsort((term, self.text))
+        term, text, counted = term[by_text], self.text[by_text], counted[by_text]
+        keep = counted.copy()
+        keep[1:] &= (term[1:] != term[:-1]) | (text[1:] != text[:-1])
+        self.text_terms = term[keep]
+        self.text_offsets = np.searchsorted(text[keep], base + np.arange(len(texts) + 1))
+        self.base = base
+
+    def postings(self, term):
+        i = np.searchsorted(self.terms, term)
+        if i == len(self.terms) or self.terms[i] != term:
+            return self.text[:0], self.pos[:0]
+        sl = slice(self.offsets[i], self.offsets[i + 1])
+        return self.text[sl], self.pos[sl]
+
+
+class CommentIndex:
+
+    def __init__(self, comments=None, departments=None):
+        self.ids = {}
+        self.vocab = {}
+        self.segments = []
+        self.row_text = np.zeros(0, dtype=np.int32)
+        self.departments = []
+        self.row_dept = np.zeros(0, dtype=np.int16)
+        if comments is not None:
+            self.add(comments, departments)
+
+    @property
+    def n(self):
+        return len(self.row_text)
+
+    #append rows, only texts never seen before are tokenized
+    def add(self, comments, departments):
+        codes, texts = pd.factorize(pd.Series(comments, dtype=object).fillna(''))
+        new = [t for t in texts if t not in self.ids]
+        if new:
+            base = len(self.ids)
+            self.segments.append(_Segment(new, base, self.vocab))
+            self.ids.update((t, base + i) for i, t in enumerate(new))
+        text_id = np.array([self.ids[t] for t in texts], dtype=np.int32)
+
+        dcodes, dnames = pd.factorize(pd.Series(departments, dtype=object))
+        for d in dnames:
+            if d not in self.departments:
+                self.departments.append(d)
+        dept_id = np.array([self.departments.index(d) for d in dnames], dtype=np.int16)
+
+        self.row_text = np.concatenate([self.row_text, text_id[codes]])
+        self.row_dept = np.concatenate([self.row_dept, dept_id[dcodes]])
+
+    def _texts_with(self, tokens):
+        found = []
+        for seg in self.segments:
+            keys = None
+            for i, term in enumerate(tokens):
+                text, pos = seg.postings(term)
+                ok = pos >= i
+                k = np.unique(text[ok].astype(np.int64) * _SPAN + (pos[ok] - i))
+                keys = k if keys is None else np.intersect1d(keys, k, assume_unique=True)
+                if len(keys) == 0:
+                    break
+            found.append(np.unique(keys // _SPAN))
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    #bool per text: matches every word and phrase of q
+    def matching_texts(self, q):
+        hit = np.ones(len(self.ids), dtype=bool)
+        for tokens in parse_query(q):
+            part = np.zeros(len(self.ids), dtype=bool)
+            part[self._texts_with(tokens)] = True
+            hit &= part
+        return hit
+
+    #sorted rows whose comment matches q, optionally restricted to the positions in within
+    def search(self, q, within=None):
+        rows = np.arange(self.n) if within is None else np.asarray(within)
+        return rows[self.matching_texts(q)[self.row_text[rows]]]
+
+    #Department and its most mentioned terms (comments mentioning each) over rows
+    def term_counts(self, rows=None, top=5):
+        rows = np.arange(self.n) if rows is None else np.asarray(rows)
+        ndept = len(self.departments)
+
+        #comments per (text, department), then per (term, department) through each text's terms
+        per_text = np.bincount(self.row_text[rows].astype(np.int64) * ndept + self.row_dept[rows], minlength=len(self.ids) * ndept).reshape(-1, ndept)
+        text, dept = np.nonzero(per_text)
+        weight = per_text[text, dept]
+        counts = np.zeros(len(self.vocab) * ndept, dtype=np.int64)
+        for seg in self.segments:
+            here = (text >= seg.base) & (text < seg.base + len(seg.text_offsets) - 1)
+            t, d, w = text[here] - seg.base, dept[here], weight[here]
+            #every counted term of each (text, department) with comments, as term * ndept + department
+            start, size = seg.text_offsets[t], np.diff(seg.text_offsets)[t]
+            at = np.repeat(start - np.cumsum(size) + size, size) + np.arange(size.sum())
+            key = seg.text_terms[at].astype(np.int64) * ndept + np.repeat(d, size)
+            counts += np.bincount(key, weights=np.repeat(w, size), minlength=len(counts)).astype(np.int64)
+        counts = counts.reshape(-1, ndept)
+
+        vocab = list(self.vocab)
+
+        out = []
+        has = per_text.sum(axis=0) > 0
+        for d in sorted(np.flatnonzero(has), key=lambda d: self.departments[d]):
+            name, c = self.departments[d], counts[:, d]
+            #the top counts, ties in alphabetical order so the result does not depend on how rows were added
+            cut = max(np.partition(c, -top)[-top], 1) if len(c) >= top else 1
+            best = sorted(np.flatnonzero(c >= cut), key=lambda i: (-c[i], vocab[i]))[:top]
+            out.append({'Department': name, 'Top terms': ', '.join(f'{vocab[i]} ({c[i]:,})' for i in best)})
+        return pd.DataFrame(out, columns=['Department', 'Top terms'])
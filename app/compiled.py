@@ -0,0 +1,309 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import json
+import os
+import tempfile
+import numpy as np
+
+
+#rows evaluated together, keeps the (rows x trees) tables in cache
+_BLOCK = 1024
+#inputs from this many rows are split over _THREADS threads, numpy's gathers release the GIL
+_PARALLEL_ROWS = 8 * _BLOCK
+_THREADS = int(os.environ.get('CHURN_SCORE_THREADS', min(4, os.cpu_count() or 1)))
+#a tree's leaves are one bit each of a uint64 mask
+_MAX_LEAVES = 64
+#largest leaf-mask tables kept for scoring, bigger ensembles score by walking the trees
+_MAX_MASK_BYTES = 64 * 2**20
+#largest |compiled - predict_proba| accepted when a model is compiled
+_TOLERANCE = 1e-6
+#largest |compiled - approximate pred_contribs| accepted, in margin (log-odds) units
+_CONTRIB_TOLERANCE = 1e-4
+#what a compiled model is made of, anything saved without one of them is compiled again
+_ARRAYS = {'feature', 'threshold', 'default_left', 'children', 'roots', 'depth', 'node_mean', 'leaf_slot', 'cuts', 'cut_start', 'masks', 'leaf', 'base_margin', 'mean', 'scale'}
+
+_POOL = None
+
+
+def _pool():
+    global _POOL
+    if _POOL is None:
+        _POOL = ThreadPoolExecutor(_THREADS, thread_name_prefix='score')
+    return _POOL
+
+
+#PICKLED XGBClassifier + StandardScaler -> PACKED NUMPY ARRAYS
+#the nodes of every tree are stored once, explicitly: split feature, threshold, missing-value
+#direction and the left child (the right one sits next to it), breadth first, trees one after
+#the other from roots. a leaf is its own child with a NaN threshold, so walking `depth` levels
+#parks every row on its leaf whatever the tree's shape. node_mean holds every node's
+#cover-weighted mean leaf value for the per-feature attributions.
+#scoring does not walk the trees. a tree's leaves (at most 64) are bits of a mask, left to
+#right, and every split clears the leaves left of it when a row goes right; the row's leaf is
+#then the lowest bit left once every split the row goes right at is applied. the splits on a
+#feature a row goes right at are the ones with a threshold <= its value, a prefix of the
+#feature's sorted thresholds (cuts), so masks holds per feature, per cut, the and of every
+#tree's masks up to that cut: a row is one searchsorted and one row gather per feature, and
+#an and over them. a feature's table is its cut_start[f+1] - cut_start[f] cuts plus a row for
+#values below every cut and one for missing values, leaf holds the leaf values in mask order
+class CompiledModel:
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        for k, v in arrays.items():
+            setattr(self, k, v)
+        self.base_margin = np.float32(self.base_margin)
+        self.depth = int(self.depth)
+
+        self.tables = [(f, self.cuts[a:b], self.masks[a + 2 * f:b + 2 * f + 2]) for f, (a, b) in enumerate(zip(self.cut_start[:-1], self.cut_start[1:])) if b > a]
+        self.leaf_offsets = np.arange(len(self.roots), dtype='int32') * self.leaf.shape[1]
+        #float that holds the lowest bit of a mask exactly
+        self.bit_float = 'float32' if self.masks.dtype == np.uint32 else 'float64'
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with np.load(path) as f:
+                if not _ARRAYS <= set(f.files):
+                    return None
+                return cls({k: f[k] for k in f.files})
+        except Exception:
+            #missing, unreadable or from an older layout, caller compiles again
+            return None
+
+    #PUBLISH AS path ATOMICALLY AND DROP OLDER COMPILES NEXT TO IT
+    def save(self, path):
+        path = Path(path)
+        name = path.stem.split('-')[0]
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{name}-', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.savez(f, **self.arrays)
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+            for stale in path.parent.glob(f'{name}-*.npz'):
+                if stale != path:
+                    stale.unlink(missing_ok=True)
+        except OSError:
+            #read-only deployments compile on every start instead
+            pass
+
+    #raw model features (in the scaler's column order) -> scaled features
+    def transform(self, X):
+        return (np.asarray(X, dtype='float64') - self.mean) / self.scale
+
+    #scaled features -> probability of the positive class, float32 like the booster's output
+    def predict_scaled(self, X):
+        X = np.asarray(X, dtype='float32')
+        out = np.empty(len(X), dtype='float32')
+        if len(X) < _PARALLEL_ROWS or _THREADS < 2:
+            self._predict_rows(X, out)
+            return out
+
+        #whole blocks per thread, each writes its own slice of out
+        step = -(-len(X) // (_THREADS * _BLOCK)) * _BLOCK
+        list(_pool().map(lambda at: self._predict_rows(X[at:at + step], out[at:at + step]), range(0, len(X), step)))
+        return out
+
+    def _predict_rows(self, X, out):
+        for start in range(0, len(X), _BLOCK):
+            x = X[start:start + _BLOCK]
+            margin = self.base_margin + self.leaf.take(self._leaves(x) if len(self.masks) else self._walk(x)).sum(axis=1)
+            out[start:start + _BLOCK] = np.float32(1) / (np.float32(1) + np.exp(-margin))
+
+    #(rows x trees) positions in leaf of the leaf every row lands on, from the mask tables
+    def _leaves(self, x):
+        alive = None
+        for f, cuts, masks in self.tables:
+            v = x[:, f]
+            at = np.searchsorted(cuts, v, side='right')
+            missing = np.isnan(v)
+            if missing.any():
+                at[missing] = len(masks) - 1
+            alive = masks.take(at, axis=0) if alive is None else np.bitwise_and(alive, masks.take(at, axis=0), out=alive)
+        if alive is None:
+            return np.broadcast_to(self.leaf_offsets, (len(x), len(self.leaf_offsets)))
+        lowest = alive & (~alive + alive.dtype.type(1))
+        return np.frexp(lowest.astype(self.bit_float))[1] - 1 + self.leaf_offsets
+
+    #the same positions walking the nodes, for ensembles too big for mask tables
+    def _walk(self, x):
+        node = self._descend(x)[-1]
+        return self.leaf_slot.take(node)
+
+    #(rows x trees) node of every row at every level, roots first
+    def _descend(self, x):
+        flat = x.ravel()
+        row = np.arange(len(x), dtype='int32')[:, None] * x.shape[1]
+        missing = np.isnan(x).any()
+
+        nodes = [np.broadcast_to(self.roots, (len(x), len(self.roots)))]
+        for _ in range(self.depth):
+            i = nodes[-1]
+            v = flat.take(row + self.feature.take(i))
+            right = v >= self.threshold.take(i)
+            if missing:
+                right |= np.isnan(v) & ~self.default_left.take(i)
+            nodes.append(self.children.take(i) + right)
+        return nodes
+
+    def predict(self, X):
+        return self.predict_scaled(self.transform(X))
+
+    #PER-FEATURE ATTRIBUTIONS (Saabas): walking a row down a tree, every split moves the expected
+    #value from the node's mean to the child's and the move is credited to the split feature.
+    #scaled features -> float32 (rows x features + 1) in margin units, the last column is the
+    #expected margin, a row sums to its margin. same as the booster's
+    #predict(..., pred_contribs=True, approx_contribs=True)
+    def contributions_scaled(self, X):
+        X = np.asarray(X, dtype='float32')
+        nfeat = X.shape[1]
+        out = np.empty((len(X), nfeat + 1), dtype='float32')
+        out[:, nfeat] = self.base_margin + self.node_mean.take(self.roots).sum(dtype='float32')
+
+        for start in range(0, len(X), _BLOCK):
+            x = X[start:start + _BLOCK]
+            row = np.arange(len(x), dtype='int32')[:, None] * nfeat
+            contrib = np.zeros(len(x) * nfeat)
+            nodes = self._descend(x)
+            #a leaf is its own child, the levels under it move nothing
+            for i, child in zip(nodes[:-1], nodes[1:]):
+                delta = self.node_mean.take(child) - self.node_mean.take(i)
+                contrib += np.bincount((row + self.feature.take(i)).ravel(), weights=delta.ravel(), minlength=len(contrib))
+
+            out[start:start + _BLOCK, :nfeat] = contrib.reshape(len(x), nfeat)
+
+        return out
+
+    def contributions(self, X):
+        return self.contributions_scaled(self.transform(X))
+
+    #same layout as the classifier's predict_proba: [staying, leaving] per row
+    def predict_proba(self, X):
+        p = self.predict(X)
+        return np.column_stack([1 - p, p])
+
+
+def compile_model(model, scaler):
+    learner = json.loads(model.get_booster().save_raw('json'))['learner']
+    objective = learner['objective']['name']
+    trees = learner['gradient_booster']['model'].get('trees')
+    if objective != 'binary:logistic' or trees is None:
+        raise ValueError(f'cannot compile a {learner["gradient_booster"]["name"]} model with objective {objective}')
+    if any(any(t['split_type']) for t in trees):
+        raise ValueError('cannot compile categorical splits')
+    leaves = [t['left_children'].count(-1) for t in trees]
+    if max(leaves) > _MAX_LEAVES:
+        raise ValueError(f'cannot compile trees with more than {_MAX_LEAVES} leaves, tree {int(np.argmax(leaves))} has {max(leaves)}')
+
+    nfeat = len(scaler.mean_)
+    width = 32 if max(leaves) <= 32 else 64
+    everything = (1 << width) - 1
+    feature, threshold, default_left, children, node_mean, roots, leaf_slot = [], [], [], [], [], [], []
+    leaf = np.zeros((len(trees), width), dtype='float32')
+    #feature -> (threshold, tree, mask once a row goes right, default left) of every split on it
+    splits = [[] for _ in range(nfeat)]
+    depth = 0
+
+    for k, t in enumerate(trees):
+        left, right = t['left_children'], t['right_children']
+        #breadth first, both children of a node next to each other
+        order, level = [0], {0: 0}
+        for n in order:
+            if left[n] != -1:
+                order += [left[n], right[n]]
+                level[left[n]] = level[right[n]] = level[n] + 1
+        at = {n: len(feature) + i for i, n in enumerate(order)}
+        roots.append(len(feature))
+        depth = max(depth, max(level.values()))
+
+        #leaves left to right, the bits of the tree's masks
+        def bits(n):
+            if left[n] == -1:
+                leaf[k, bits.count] = t['split_conditions'][n]
+                bits.slot[n] = k * width + bits.count
+                bits.count += 1
+                return 1 << (bits.count - 1)
+            under_left = bits(left[n])
+            under = under_left | bits(right[n])
+            splits[t['split_indices'][n]].append((np.float32(t['split_conditions'][n]), k, everything & ~under_left, t['default_left'][n]))
+            return under
+        bits.count, bits.slot = 0, {}
+        bits(0)
+
+        #weighted by cover (hessian sums) like the booster's own node means
+        cover, mean = t['sum_hessian'], {}
+        for n in reversed(order):
+            mean[n] = t['split_conditions'][n] if left[n] == -1 else (mean[left[n]] * cover[left[n]] + mean[right[n]] * cover[right[n]]) / cover[n]
+
+        for n in order:
+            split = left[n] != -1
+            feature.append(t['split_indices'][n] if split else 0)
+            threshold.append(t['split_conditions'][n] if split else np.nan)
+            default_left.append(bool(t['default_left'][n]) if split else True)
+            children.append(at[left[n]] if split else at[n])
+            node_mean.append(mean[n])
+            leaf_slot.append(bits.slot.get(n, 0))
+
+    #per feature, per cut, the and of every tree's masks up to it (see CompiledModel)
+    cuts, cut_start, tables = [], [0], []
+    for f in range(nfeat):
+        ordered = sorted(splits[f], key=lambda s: s[0])
+        values = np.unique(np.array([s[0] for s in ordered], dtype='float32'))
+        table = np.full((len(values) + 2, len(trees)), everything, dtype=f'uint{width}')
+        for thr, k, mask, default in ordered:
+            table[1 + np.searchsorted(values, thr):-1, k] &= mask
+            if not default:
+                table[-1, k] &= mask
+        cuts.append(values)
+        cut_start.append(cut_start[-1] + len(values))
+        tables.append(table)
+
+    masks = np.concatenate(tables)
+    if masks.nbytes > _MAX_MASK_BYTES:
+        masks = masks[:0]
+
+    base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+
+    return CompiledModel({
+        'feature': np.array(feature, dtype='int32'),
+        'threshold': np.array(threshold, dtype='float32'),
+        'default_left': np.array(default_left, dtype=bool),
+        'children': np.array(children, dtype='int32'),
+        'roots': np.array(roots, dtype='int32'),
+        'depth': np.array(depth),
+        'node_mean': np.array(node_mean, dtype='float32'),
+        'leaf_slot': np.array(leaf_slot, dtype='int32'),
+        'cuts': np.concatenate(cuts),
+        'cut_start': np.array(cut_start),
+        'masks': masks,
+        'leaf': leaf,
+        'base_margin': np.array(np.log(base_score / (1 - base_score)), dtype='float32'),
+        'mean': scaler.mean_.astype('float64'),
+        'scale': scaler.scale_.astype('float64'),
+    })
+
+
+#PARITY CHECK: compiled vs the library's predict_proba and approximate pred_contribs on X
+#(a frame of raw model features). returns the largest probability difference, raises if
+#either is above tolerance
+def check_parity(compiled, model, scaler, X, tolerance=_TOLERANCE, contrib_tolerance=_CONTRIB_TOLERANCE):
+    if not len(X):
+        return 0.0
+    import xgboost
+
+    scaled = scaler.transform(X)
+    diff = float(np.abs(compiled.predict(X) - model.predict_proba(scaled)[:,1]).max())
+    if diff > tolerance:
+        raise ValueError(f'compiled model differs from predict_proba by {diff:.3g}')
+
+    expected = model.get_booster().predict(xgboost.DMatrix(scaled), pred_contribs=True, approx_contribs=True)
+    contrib_diff = float(np.abs(compiled.contributions(X) - expected).max())
+    if contrib_diff > contrib_tolerance:
+        raise ValueError(f'compiled attributions differ from pred_contribs by {contrib_diff:.3g}')
+    return diff
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+
+#PRE-AGGREGATED CHURN CUBE
+#one cell per (department, Leaving/Staying, salary_group, satisfaction_group, gone) combination
+#found in the data, holding a row count, per-measure sums and a histogram of each measure on a
+#fixed grid. histograms on the same grid add up, so any slice or roll-up of the cube, medians
+#and box-plot quartiles included, is answered by summing cells without touching employee rows
+_DIMS = ['department', 'Leaving/Staying', 'salary_group', 'satisfaction_group', 'gone']
+
+#histogram step per measure, values that sit on the grid (all of the extract) give exact quantiles
+_MEASURES = {'average_monthly_hours': 1.0, 'satisfaction_level': 0.1}
+
+
+#linear-interpolated quantile (numpy's default) of the values a histogram describes
+def _quantile(counts, values, q):
+    n = counts.sum()
+    if n == 0:
+        return np.nan
+    cum = np.cumsum(counts)
+    pos = (n - 1) * q
+    lo, hi = values[np.searchsorted(cum, [np.floor(pos), np.ceil(pos)], side='right')]
+    return lo + (pos - np.floor(pos)) * (hi - lo)
+
+
+class ChurnCube:
+
+    def __init__(self, df):
+        groups = df.groupby(_DIMS, observed=True, dropna=False, sort=True)
+        cell = groups.ngroup().to_numpy()
+
+        self.cells = groups.size().index.to_frame(index=False)
+        m = len(self.cells)
+
+        self.rows = np.bincount(cell, minlength=m)
+        self.sums, self.hists, self.grids = {}, {}, {}
+
+        for c, step in _MEASURES.items():
+            values = df[c].to_numpy(dtype='float64', na_value=np.nan)
+            ok = ~np.isnan(values)
+            slot = np.rint(values[ok] / step).astype(np.int64)
+            base = slot.min() if len(slot) else 0
+            nbins = int(slot.max() - base + 1) if len(slot) else 1
+
+            self.sums[c] = np.bincount(cell[ok], weights=values[ok], minlength=m)
+            self.hists[c] = np.bincount(cell[ok] * nbins + (slot - base), minlength=m * nbins).reshape(m, nbins)
+            self.grids[c] = (base + np.arange(nbins)) * step
+
+    #cells matching every condition, a condition is a single value or a list of allowed values
+    def _where(self, where):
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dim, allowed in where.items():
+            allowed = allowed if isinstance(allowed, (list, tuple)) else [allowed]
+            mask &= self.cells[dim].isin(allowed).to_numpy()
+        return np.flatnonzero(mask)
+
+    #roll the selected cells up to the dims in by: group keys and a group id per selected cell
+    def _rollup(self, by, where):
+        cells = self._where(where)
+        keys = self.cells.iloc[cells][list(by)]
+        if not by:
+            return pd.DataFrame(index=[0]), np.zeros(len(cells), dtype=np.int64), cells
+        groups = keys.groupby(list(by), observed=True, dropna=False, sort=True)
+        return groups.size().index.to_frame(index=False), groups.ngroup().to_numpy(), cells
+
+    def _sum(self, arr, gid, k):
+        out = np.zeros((k,) + arr.shape[1:], dtype=arr.dtype)
+        np.add.at(out, gid, arr)
+        return out
+
+    def count(self, by=(), **where):
+        keys, gid, cells = self._rollup(by, where)
+        keys['count'] = self._sum(self.rows[cells], gid, len(keys))
+        return keys if by else int(keys['count'].iloc[0])
+
+    def mean(self, measure, by=(), **where):
+        keys, gid, cells = self._rollup(by, where)
+        n = self._sum(self.hists[measure][cells].sum(axis=1), gid, len(keys))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            keys[measure] = self._sum(self.sums[measure][cells], gid, len(keys)) / n
+        return keys if by else keys[measure].iloc[0]
+
+    def quantile(self, measure, q, by=(), **where):
+        keys, gid, cells = self._rollup(by, where)
+        hists = self._sum(self.hists[measure][cells], gid, len(keys))
+        keys[measure] = [_quantile(h, self.grids[measure], q) for h in hists]
+        return keys if by else keys[measure].iloc[0]
+
+    def median(self, measure, by=(), **where):
+        return self.quantile(measure, .5, by, **where)
+
+    #matplotlib.cbook.boxplot_stats equivalents per group of by, ready for Axes.bxp
+    def boxplot_stats(self, measure, by, whis=1.5, **where):
+        keys, gid, cells = self._rollup([by], where)
+        hists = self._sum(self.hists[measure][cells], gid, len(keys))
+        sums = self._sum(self.sums[measure][cells], gid, len(keys))
+        grid = self.grids[measure]
+
+        stats = {}
+        for label, h, s in zip(keys[by], hists, sums):
+            n = h.sum()
+            q1, med, q3 = (_quantile(h, grid, q) for q in (.25, .5, .75))
+            iqr = q3 - q1
+
+            seen = grid[h > 0]
+            below, above = seen[seen <= q3 + whis * iqr], seen[seen >= q1 - whis * iqr]
+            whishi = max(below.max(), q3) if len(below) else q3
+            whislo = min(above.min(), q1) if len(above) else q1
+            out = (grid < whislo) | (grid > whishi)
+
+            stats[label] = {
+                'label': label, 'mean': s / n, 'med': med, 'q1': q1, 'q3': q3, 'iqr': iqr,
+                'cilo': med - 1.57 * iqr / np.sqrt(n), 'cihi': med + 1.57 * iqr / np.sqrt(n),
+                'whislo': whislo, 'whishi': whishi,
+                'fliers': np.repeat(grid[out], h[out]),
+            }
+        return stats
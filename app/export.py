@@ -0,0 +1,93 @@
+import asyncio
+import io
+import zlib
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+#STREAMING EXPORTS
+#an export is written batch_size rows at a time and every batch is handed to the download as
+#soon as it is serialized, so memory stays at one batch whatever the filter selects
+#gzip favours speed, the export is compressed while the worker streams it
+_GZIP_LEVEL = 1
+
+FORMATS = {'csv': 'CSV', 'csv.gz': 'CSV (gzip)'}
+if pq is not None:
+    FORMATS['parquet'] = 'Parquet'
+
+
+#the selected rows in batches, each gathered and prepared on its own
+def _batches(df, rows, cols, prepare, batch_size):
+    for start in range(0, max(len(rows), 1), batch_size):
+        part = df.iloc[rows[start:start + batch_size]]
+        yield prepare(part[cols] if cols is not None else part)
+
+
+def csv_chunks(df, rows, cols=None, prepare=lambda d: d, batch_size=50000):
+    for i, part in enumerate(_batches(df, rows, cols, prepare, batch_size)):
+        yield part.to_csv(index=False, header=i == 0)
+
+
+def gzip_chunks(chunks):
+    z = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 31)
+    for c in chunks:
+        out = z.compress(c.encode())
+        if out:
+            yield out
+    yield z.flush()
+
+
+#file-like sink that hands back what the writer produced since the last call, while still
+#reporting the absolute position the parquet footer offsets are computed from
+class _Drain(io.RawIOBase):
+
+    def __init__(self):
+        self.parts = []
+        self.pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.parts.append(bytes(b))
+        self.pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self.pos
+
+    def take(self):
+        out = b''.join(self.parts)
+        self.parts.clear()
+        return out
+
+
+#one row group per batch
+def parquet_chunks(df, rows, cols=None, prepare=lambda d: d, batch_size=50000):
+    sink, writer = _Drain(), None
+    for part in _batches(df, rows, cols, prepare, batch_size):
+        table = pa.Table.from_pandas(part, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table.cast(writer.schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+#chunks of an export in fmt, one of FORMATS (which double as file extensions)
+def export_chunks(fmt, df, rows, cols=None, prepare=lambda d: d, batch_size=50000):
+    if fmt == 'parquet':
+        return parquet_chunks(df, rows, cols, prepare, batch_size)
+    chunks = csv_chunks(df, rows, cols, prepare, batch_size)
+    return gzip_chunks(chunks) if fmt == 'csv.gz' else chunks
+
+
+#SERIALIZE CHUNKS ON A WORKER THREAD, the event loop keeps serving other sessions meanwhile
+async def in_thread(chunks):
+    chunks, done = iter(chunks), object()
+    while (chunk := await asyncio.to_thread(next, chunks, done)) is not done:
+        yield chunk
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+
+#MODEL INPUTS, IN THE ORDER THE SCALER WAS FITTED ON
+_FEATURES = [
+            'last_evaluation',
+            'work_accident',
+            'number_project',
+            'average_monthly_hours',
+            'time_spend_company',
+            'promotion_last_5years',
+            'salary'
+            ]
+
+#SALARY BANDS: 0 below 12M, 1 below 20M, 2 otherwise
+_SALARY_BINS = np.array([12000000, 20000000])
+
+
+def salary_band(salary_amount):
+    return np.searchsorted(_SALARY_BINS, np.asarray(salary_amount), side='right')
+
+
+def gone_mask(df):
+    return df['gone'].to_numpy(dtype=bool)
+
+
+#RAW EMPLOYEE COLUMNS -> MODEL FEATURES, one column at a time instead of row by row
+def featurize(df):
+    return pd.DataFrame({
+            'last_evaluation': df['last_evaluation'].to_numpy(dtype=float) / 10.0,
+            'work_accident': df['work_accident'].to_numpy(dtype=bool).astype(int),
+            'number_project': df['number_project'].to_numpy(),
+            'average_monthly_hours': df['average_monthly_hours'].to_numpy(),
+            'time_spend_company': df['time_spend_company'].to_numpy(),
+            'promotion_last_5years': df['promotion_last_5years'].to_numpy(dtype=bool).astype(int),
+            'salary': salary_band(df['salary_amount'])
+        }, columns=_FEATURES, index=df.index)
+
+
+#PROBABILITY -> 'Leaving'/'Staying', None where there is no probability (past employees)
+def leaving_label(prob, threshold):
+    prob = np.asarray(prob, dtype=float)
+    label = np.where(prob < threshold, 'Staying', 'Leaving').astype(object)
+    label[np.isnan(prob)] = None
+    return label
@@ -0,0 +1,169 @@
+from pathlib import Path
+import json
+import numpy as np
+import plotly
+import plotly.graph_objects as go
+from htmltools import HTMLDependency
+from shiny import render, ui
+
+
+#PLOTLY VERSIONS OF THE OVERVIEW/BREAKDOWN CHARTS
+#each builder takes the small aggregated frame the chart displays and only that figure's JSON
+#is sent. plotly.js is a static dependency the browser loads once and caches, then handles
+#resizing, hovering and the stacked/total toggle without another round trip to the server
+_PLOTLY_JS = HTMLDependency(
+                'plotly', plotly.__version__,
+                source={'subdir': str(Path(plotly.__file__).parent / 'package_data')},
+                script={'src': 'plotly.min.js'}
+            )
+_LEAVE_COLORS = {'Leaving': '#FF4500', 'Staying': '#32CD32'}
+_SATISFACTION_LABELS = {'Bad': 'Bad (1-5)', 'Neutral': 'Neutral (5-7)', 'Good': 'Good (7-10)'}
+_SATISFACTION_COLORS = {'Bad': 'red', 'Neutral': 'yellow', 'Good': 'green'}
+
+
+#dark styling set directly, a plotly template would be copied into every figure sent
+def _layout(fig, title=None, **kwargs):
+    fig.update_layout(
+        template='none',
+        title=title,
+        font_color='#ffffff',
+        paper_bgcolor='#000000',
+        plot_bgcolor='#000000',
+        margin=dict(l=10, r=10, t=50, b=10),
+        legend=dict(orientation='h', yanchor='bottom', y=1, xanchor='left', x=0),
+        **kwargs
+    )
+    fig.update_xaxes(gridcolor='#333333', zeroline=False)
+    fig.update_yaxes(gridcolor='#333333', zeroline=False)
+    return fig
+
+
+#counts: department, Leaving/Staying, count
+def department_headcount(counts, colors, stacked):
+    wide = counts.pivot_table(index='department', columns='Leaving/Staying', values='count', aggfunc='sum', observed=True, fill_value=0)
+    depts = wide.index.astype(str)
+    total = wide.sum(axis=1)
+
+    fig = go.Figure()
+    for status, color in (('Staying', 'green'), ('Leaving', 'red')):
+        values = wide[status] if status in wide else np.zeros(len(wide), dtype=int)
+        fig.add_bar(x=depts, y=values, name=status, marker_color=color, text=values, textposition='inside')
+    fig.add_bar(x=depts, y=total, name='Total', marker_color=colors[:len(depts)], text=total, textposition='outside', showlegend=False)
+
+    _layout(fig, barmode='stack')
+    show_stacked(fig, stacked)
+    return fig
+
+
+_STACK_TITLES = {True: 'Estimated total employees staying/leaving in each department', False: 'Total employees in each department'}
+
+#flip department_headcount between the Staying/Leaving stack and the plain totals
+def show_stacked(fig, stacked):
+    fig.update_traces(visible=stacked, selector=dict(name='Staying'))
+    fig.update_traces(visible=stacked, selector=dict(name='Leaving'))
+    fig.update_traces(visible=not stacked, selector=dict(name='Total'))
+    fig.update_layout(title=_STACK_TITLES[stacked])
+
+
+#the same flip done in the browser whenever the switch input_id changes
+def stack_toggle(div_id, input_id):
+    return ui.tags.script(f'''
+        (function() {{
+            var sw = document.getElementById({json.dumps(input_id)});
+            if (!sw || sw.dataset.stackToggle) return;
+            sw.dataset.stackToggle = '1';
+            sw.addEventListener('change', function() {{
+                var div = document.getElementById({json.dumps(div_id)});
+                if (!div) return;
+                var s = sw.checked;
+                Plotly.update(div, {{visible: [s, s, !s]}}, {{'title.text': s ? {json.dumps(_STACK_TITLES[True])} : {json.dumps(_STACK_TITLES[False])}}});
+            }});
+        }})();
+    ''')
+
+
+#FIGURE -> UI: the figure's JSON plus plotly.js as a (cached) dependency
+def to_ui(fig, div_id, *extra):
+    html = fig.to_html(full_html=False, include_plotlyjs=False, div_id=div_id, default_height='100%',
+                        config={'responsive': True, 'displaylogo': False})
+    return ui.div(_PLOTLY_JS, ui.HTML(html), *extra, style='height: 100%; min-height: 20rem;')
+
+
+#render.ui whose output fills its card like a plot does
+class render_figure(render.ui):
+
+    def auto_output_ui(self):
+        return ui.output_ui(self.output_id, fill=True, fillable=True)
+
+
+#stats: {department: boxplot stats} as ChurnCube.boxplot_stats returns them
+def satisfaction_box(stats, depts, colors):
+    fig = go.Figure()
+    for d, color in zip(depts, colors):
+        s = stats[d]
+        fig.add_box(
+            y=[d], q1=[s['q1']], median=[s['med']], q3=[s['q3']], mean=[s['mean']],
+            lowerfence=[s['whislo']], upperfence=[s['whishi']],
+            orientation='h', name=d, fillcolor=color, line_color='white', showlegend=False
+        )
+        fliers = np.unique(s['fliers'])
+        if len(fliers):
+            fig.add_scatter(x=fliers, y=[d] * len(fliers), mode='markers', marker=dict(color='white', size=5), name=d, showlegend=False)
+
+    _layout(fig, xaxis_title='Satisfaction Score')
+    fig.update_yaxes(categoryorder='array', categoryarray=list(depts), autorange='reversed')
+    return fig
+
+
+#counts: satisfaction_group, count
+def satisfaction_pie(counts):
+    groups = [str(g) for g in counts['satisfaction_group']]
+    fig = go.Figure(go.Pie(
+        labels=[_SATISFACTION_LABELS.get(g, g) for g in groups],
+        values=counts['count'],
+        marker_colors=[_SATISFACTION_COLORS.get(g) for g in groups],
+        sort=False, direction='clockwise', rotation=0, textinfo='percent',
+        textfont=dict(color='black', size=12)
+    ))
+    return _layout(fig)
+
+
+def in_out(df):
+    years = df['year'].astype(str)
+    fig = go.Figure()
+    fig.add_bar(x=years, y=df['in'], name='Incoming', text=df['in'])
+    fig.add_bar(x=years, y=df['out'], name='Departing', text=df['out'])
+    fig.add_vrect(x0=-.5, x1=2.5, fillcolor='#999999', opacity=.3, line_width=0)
+    return _layout(fig, barmode='group')
+
+
+def salaries(df):
+    years = df['year'].astype(str)
+    fig = go.Figure()
+    for c, name, color in (('low', 'Low', '#FF4500'), ('standard', 'Standard', '#FFD700'), ('high', 'High', '#32CD32')):
+        fig.add_bar(x=years, y=df[c], name=name, marker_color=color, text=[f'{v * 100:.0f}%' for v in df[c]], textposition='inside', textfont_color='#323232')
+    _layout(fig, 'Employees Salaries over the Years', barmode='stack')
+    fig.update_yaxes(showticklabels=False)
+    return fig
+
+
+#hours: department, Leaving/Staying, average_monthly_hours
+def median_hours(hours):
+    fig = go.Figure()
+    for status, rows in hours.groupby('Leaving/Staying', observed=True):
+        fig.add_bar(x=rows['department'], y=rows['average_monthly_hours'], name=str(status), marker_color=_LEAVE_COLORS.get(str(status)), texttemplate='%{y:.2f}')
+    return _layout(fig, 'Hours Worked per Employee per Month (Median)', barmode='group')
+
+
+#hours: department, average_monthly_hours
+def mean_hours(hours, colors):
+    fig = go.Figure(go.Bar(x=hours['department'], y=hours['average_monthly_hours'], marker_color=colors[:len(hours)], texttemplate='%{y:.2f}'))
+    return _layout(fig, 'Average Hours Worked per Employee per Month')
+
+
+#drivers: Department plus one column per survey driver
+def survey_drivers(drivers):
+    fig = go.Figure()
+    for c in drivers.columns.drop('Department'):
+        fig.add_bar(x=drivers['Department'].astype(str), y=drivers[c], name=c)
+    return _layout(fig, barmode='group')
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+
+#FILTER INDEXES
+#equality filters are packed bitmaps (1 bit per row) that combine with &/|.
+#range filters keep a packed `value < cut` bitmap per cut the inputs can land on (whole
+#percents of probability, the days responses were given on), so a range is a word-wise
+#and of two of them; bounds off the cuts fall back to a sorted copy of the column searched
+#with np.searchsorted. bitmaps are only unpacked into row positions at the very end, in the
+#smallest unsigned dtype that fits (uint16 for the extract), which is all a session keeps
+
+#distinct survey dates that get a bitmap each, two years of days
+_MAX_DATE_CUTS = 800
+
+
+def _bits(mask):
+    return np.packbits(mask)
+
+
+class BitmapIndex:
+
+    def __init__(self, n):
+        self.n = n
+        self.row_dtype = np.min_scalar_type(max(n - 1, 0))
+        self.all = _bits(np.ones(n, dtype=bool))
+        self.none = _bits(np.zeros(n, dtype=bool))
+
+    def category_bits(self, col):
+        codes = col.cat.codes.to_numpy() if isinstance(col.dtype, pd.CategoricalDtype) else pd.factorize(col)[0]
+        cats = col.cat.categories if isinstance(col.dtype, pd.CategoricalDtype) else pd.unique(col)
+        return {c: _bits(codes == i) for i, c in enumerate(cats)}
+
+    def any_of(self, bitmaps, keys):
+        out = self.none.copy()
+        for k in keys:
+            if k in bitmaps:
+                out |= bitmaps[k]
+        return out
+
+    #packed `values < cut` for every sorted cut (NaN/NaT is below none). each value is coded
+    #once as the number of cuts at or under it, value < cuts[i] is then code <= i
+    def below_bits(self, values, cuts):
+        codes = np.searchsorted(cuts, values, side='right').astype(np.min_scalar_type(len(cuts)))
+        return [_bits(codes <= i) for i in range(len(cuts))]
+
+    #rows_sorted_by holds the positions of every row that has a value, in value order
+    def range_bits(self, rows_sorted_by, values, lo, hi, everything):
+        a = np.searchsorted(values, lo, side='left')
+        b = np.searchsorted(values, hi, side='right')
+        if a == 0 and b == len(values):
+            return everything
+        mask = np.zeros(self.n, dtype=bool)
+        mask[rows_sorted_by[a:b]] = True
+        return _bits(mask)
+
+    def mask(self, bits):
+        return np.unpackbits(bits, count=self.n).view(bool)
+
+    def rows(self, bits):
+        if np.array_equal(bits, self.all):
+            return np.arange(self.n, dtype=self.row_dtype)
+        return self.compact(np.flatnonzero(self.mask(bits)))
+
+    #positions from elsewhere (search results, slices) in the same compact dtype
+    def compact(self, rows):
+        return np.asarray(rows).astype(self.row_dtype, copy=False)
+
+
+class EmployeeIndex(BitmapIndex):
+
+    def __init__(self, df):
+        super().__init__(len(df))
+        self.department = self.category_bits(df['department'])
+        self.gone = df['gone'].to_numpy(dtype=bool)
+        self.gone_bits = _bits(self.gone)
+
+        prob = df['prob'].to_numpy(dtype='float64', na_value=np.nan)
+        valid = np.flatnonzero(~np.isnan(prob))
+        order = np.argsort(prob[valid], kind='stable')
+        self.prob_rows = valid[order]
+        self.prob_sorted = prob[valid][order]
+        self.prob_na = _bits(np.isnan(prob))
+        self.prob_valid = _bits(~np.isnan(prob))
+
+        #the probability sliders move in whole percents. a value sitting exactly on a cut
+        #also needs its own bitmap for the inclusive upper bound, only a few cuts have one
+        self.prob_cuts = np.arange(101) / 100
+        self.prob_below = self.below_bits(prob, self.prob_cuts)
+        self.prob_on = {i: _bits(prob == c) for i, c in enumerate(self.prob_cuts) if (self.prob_sorted == c).any()}
+
+    def departments(self, depts):
+        return self.any_of(self.department, depts)
+
+    #past employees have no probability and always pass, like the table has always shown them
+    def prob_between(self, lo, hi):
+        lo, hi = self.prob_sorted.dtype.type(lo), self.prob_sorted.dtype.type(hi)
+        i, j = np.searchsorted(self.prob_cuts, (lo, hi))
+        if i < len(self.prob_cuts) and j < len(self.prob_cuts) and self.prob_cuts[i] == lo and self.prob_cuts[j] == hi:
+            upto = self.prob_below[j] | self.prob_on[j] if j in self.prob_on else self.prob_below[j]
+            return (upto & ~self.prob_below[i]) | self.prob_na
+        return self.range_bits(self.prob_rows, self.prob_sorted, lo, hi, self.prob_valid) | self.prob_na
+
+    def select(self, depts=None, prob=None):
+        bits = self.all
+        if depts is not None:
+            bits = bits & self.departments(depts)
+        if prob is not None:
+            bits = bits & self.prob_between(*prob)
+        return self.rows(bits)
+
+
+class SurveyIndex(BitmapIndex):
+
+    def __init__(self, df):
+        super().__init__(len(df))
+        self.department = self.category_bits(df['Department'])
+
+        dates = df['Date'].to_numpy()
+        self.date_rows = np.argsort(dates, kind='stable')
+        self.date_sorted = dates[self.date_rows]
+
+        #one cut per distinct date and one past the last, no response falls between two cuts,
+        #so any range snaps onto them exactly. too many distinct dates (timestamps rather
+        #than days) would cost a bitmap each, those ranges use the sorted copy instead
+        cuts = np.unique(self.date_sorted[~np.isnat(self.date_sorted)])
+        self.date_cuts = np.append(cuts, cuts[-1] + np.timedelta64(1, 'ns')) if 0 < len(cuts) <= _MAX_DATE_CUTS else None
+        self.date_below = self.below_bits(dates, self.date_cuts) if self.date_cuts is not None else None
+
+    def departments(self, depts):
+        return self.any_of(self.department, depts)
+
+    def dates_between(self, start, end):
+        start, end = np.datetime64(start, 'ns'), np.datetime64(end, 'ns')
+        if self.date_cuts is None:
+            return self.range_bits(self.date_rows, self.date_sorted, start, end, self.all)
+        #start <= date is date >= the first cut from start, date <= end is date < the first cut past end
+        i = np.searchsorted(self.date_cuts, start, side='left')
+        j = np.searchsorted(self.date_cuts, end, side='right')
+        if i >= j:
+            return self.none
+        return (self.date_below[j] if j < len(self.date_cuts) else self.all) & ~self.date_below[i]
+
+    def select(self, depts=None, dates=None):
+        bits = self.all
+        if depts is not None:
+            bits = bits & self.departments(depts)
+        if dates is not None:
+            bits = bits & self.dates_between(*dates)
+        return self.rows(bits)
@@ -0,0 +1,111 @@
+from collections import Counter
+import logging
+from shiny import reactive
+from metrics import register
+
+
+log = logging.getLogger(__name__)
+
+#what a session starts from: every department, probability and survey date, no search.
+#each side keeps its own departments, None is every department, () none ticked
+DEFAULT = {
+            'main_depts': None,
+            'survey_depts': None,
+            'prob': (0.0, 1.0),
+            'dates': None,
+            'main_name': '',
+            'main_id': None,
+            'survey_name': '',
+            'survey_id': None,
+            'comments': '',
+}
+
+#the fields each side's derived selections read
+SLICES = {
+            'main': ('main_depts', 'prob', 'main_name', 'main_id'),
+            'survey': ('survey_depts', 'dates', 'survey_name', 'survey_id', 'comments'),
+}
+
+#recomputes of derived selections per name and filter clicks per panel, every session of the process
+TOTALS = Counter()
+CLICKS = Counter()
+register('filter_recomputes', lambda: TOTALS, label='selection')
+register('filter_clicks', lambda: CLICKS, label='panel')
+
+
+#ONE FILTER STATE PER SESSION
+#the three filter panels write the fields they show into one spec, instead of setting each
+#other's inputs and selections. each side's slice of the spec is a reactive value that is only
+#set when one of its fields changed, so the selections derived from it are recomputed once per
+#committed change (shiny runs everything a flush invalidated once, however many writes landed
+#in the tick) and not at all when a click did not touch them. derived selections call
+#recomputed(), counted per click
+class FilterState:
+
+    def __init__(self, all_depts):
+        self.all_depts = all_depts
+        self.spec = dict(DEFAULT)
+        self.slices = {k: reactive.value(self._slice(k)) for k in SLICES}
+        self.committed = reactive.value(dict(self.spec))
+        #bumped on every write, changed or not, so the counters can be shown after each click
+        self.writes = reactive.value(0)
+
+        self.clicks = Counter()
+        self.recomputes = Counter()
+        self.last_click = None
+        self.last_recomputes = Counter()
+        #fields the last write changed, for syncing the other panels' inputs
+        self.fields = set()
+
+    def _slice(self, name):
+        return tuple(self.spec[f] for f in SLICES[name])
+
+    def main(self):
+        return dict(zip(SLICES['main'], self.slices['main']()))
+
+    def survey(self):
+        return dict(zip(SLICES['survey'], self.slices['survey']()))
+
+    #ticked departments in list order, None when every department is ticked
+    def _depts(self, depts):
+        depts = tuple(d for d in self.all_depts if d in depts)
+        return None if len(depts) == len(self.all_depts) else depts
+
+    #merge a panel's fields into the spec and publish the slices that changed
+    def write(self, source, **fields):
+        unknown = set(fields) - set(DEFAULT)
+        if unknown:
+            raise KeyError(f'unknown filter fields {sorted(unknown)}')
+        for f in ('main_depts', 'survey_depts'):
+            if fields.get(f) is not None:
+                fields[f] = self._depts(fields[f])
+
+        self.clicks[source] += 1
+        CLICKS[source] += 1
+        self.last_click, self.last_recomputes = source, Counter()
+        before = {name: self._slice(name) for name in SLICES}
+        self.fields = {f for f, v in fields.items() if self.spec[f] != v}
+        self.spec.update(fields)
+
+        changed = [name for name in SLICES if self._slice(name) != before[name]]
+        for name in changed:
+            self.slices[name].set(self._slice(name))
+        if changed:
+            self.committed.set(dict(self.spec))
+        self.writes.set(sum(self.clicks.values()))
+        log.debug('%s changed %s', source, changed or 'nothing')
+        return changed
+
+    def recomputed(self, name):
+        self.recomputes[name] += 1
+        self.last_recomputes[name] += 1
+        TOTALS[name] += 1
+
+    def stats(self):
+        self.writes()
+        return {
+            'clicks': sum(self.clicks.values()),
+            'recomputes': sum(self.recomputes.values()),
+            'last_click': self.last_click,
+            'last_recomputes': dict(self.last_recomputes),
+        }
@@ -0,0 +1,56 @@
+import logging
+import time
+import pandas as pd
+from schema import unify_categories
+
+
+log = logging.getLogger(__name__)
+
+
+def row_hashes(df, cols):
+    return pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+
+
+#COMPARE TWO EXTRACTS BY key AND A PER-ROW CONTENT HASH
+def diff_rows(old, new, cols, key='id'):
+    old_hash = pd.Series(row_hashes(old, cols), index=old[key].to_numpy())
+    #categoricals hash by value, so only the plain columns need the old dtypes
+    dtypes = {c: t for c, t in old[cols].dtypes.items() if not isinstance(t, pd.CategoricalDtype)}
+    new_hash = pd.Series(row_hashes(new.astype(dtypes), cols), index=new[key].to_numpy())
+
+    added = new_hash.index.difference(old_hash.index)
+    removed = old_hash.index.difference(new_hash.index)
+    common = new_hash.index.intersection(old_hash.index)
+    changed = common[old_hash[common].to_numpy() != new_hash[common].to_numpy()]
+
+    return added, changed, removed
+
+
+#RESCORE ONLY NEW/CHANGED ROWS OF new_raw AND PATCH THEM INTO df
+#changed rows are patched in place; hires/departures from the extract return a new frame
+def apply_delta(df, new_raw, score, cols, key='id'):
+    start = time.perf_counter()
+    added, changed, removed = diff_rows(df, new_raw, cols, key)
+
+    if len(added) == 0 and len(changed) == 0 and len(removed) == 0:
+        return df, (0, 0, 0)
+
+    delta = new_raw[new_raw[key].isin(added.union(changed))]
+    scored = score(delta.copy())
+    unify_categories(df, scored)
+    scored = scored.astype(df.dtypes.to_dict())
+
+    if len(changed):
+        upd = scored[scored[key].isin(changed)]
+        labels = df.index[pd.Index(df[key]).get_indexer(upd[key])]
+        for c in df.columns:
+            df.loc[labels, c] = upd[c].to_numpy()
+
+    if len(removed) or len(added):
+        keep = df[~df[key].isin(removed).to_numpy()]
+        df = pd.concat([keep, scored[scored[key].isin(added)]], ignore_index=True)
+
+    log.info('rescored %d new and %d changed rows, dropped %d, in %.3fs (%d rows total)',
+             len(added), len(changed), len(removed), time.perf_counter() - start, len(df))
+
+    return df, (len(added), len(changed), len(removed))
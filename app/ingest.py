@@ -0,0 +1,97 @@
+import logging
+import time
+import numpy as np
+import pandas as pd
+
+
+log = logging.getLogger(__name__)
+
+_BLOCK = 1 << 20
+
+
+def count_rows(path):
+    with open(path, 'rb') as f:
+        lines, last = 0, b'\n'
+        for block in iter(lambda: f.read(_BLOCK), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    #header line, plus a last row without a trailing newline
+    return lines - 1 + (last != b'\n')
+
+
+#PREALLOCATED COLUMNS THE SCORED CHUNKS ARE COPIED INTO
+#categoricals keep only their codes against categories collected across chunks,
+#nullable columns are held as their numpy dtype with NaN until to_frame()
+class ColumnStore:
+
+    def __init__(self, template, nrows):
+        self.n = 0
+        self.dtypes = template.dtypes.to_dict()
+        self.categories = {}
+        self.cols = {}
+        for c, dt in self.dtypes.items():
+            if isinstance(dt, pd.CategoricalDtype):
+                self.categories[c] = pd.Index(dt.categories)
+                self.cols[c] = np.empty(nrows, dtype=np.int32)
+            elif isinstance(dt, pd.api.extensions.ExtensionDtype):
+                self.cols[c] = np.empty(nrows, dtype=dt.numpy_dtype)
+            else:
+                self.cols[c] = np.empty(nrows, dtype=dt)
+
+    def append(self, chunk):
+        end = self.n + len(chunk)
+        if end > len(next(iter(self.cols.values()))):
+            #row count was an estimate (e.g. quoted newlines), grow geometrically
+            for c in self.cols:
+                self.cols[c] = np.resize(self.cols[c], max(end, 2 * len(self.cols[c])))
+
+        for c, dt in self.dtypes.items():
+            if c in self.categories:
+                cats = self.categories[c].append(chunk[c].cat.categories.difference(self.categories[c]))
+                self.categories[c] = cats
+                values = pd.Categorical(chunk[c], categories=cats).codes
+            elif isinstance(dt, pd.api.extensions.ExtensionDtype):
+                values = chunk[c].to_numpy(dtype=dt.numpy_dtype, na_value=np.nan)
+            else:
+                values = chunk[c].to_numpy()
+            self.cols[c][self.n:end] = values
+        self.n = end
+
+    def to_frame(self):
+        data = {}
+        for c, dt in self.dtypes.items():
+            col = self.cols[c][:self.n]
+            if c in self.categories:
+                cat = pd.Categorical.from_codes(col, categories=self.categories[c], ordered=dt.ordered)
+                #same category order a single-shot astype('category') would give
+                data[c] = cat if dt.ordered else cat.reorder_categories(self.categories[c].sort_values())
+            elif isinstance(dt, pd.api.extensions.ExtensionDtype):
+                data[c] = pd.array(col, dtype=dt)
+            else:
+                data[c] = col
+        return pd.DataFrame(data, copy=False)
+
+
+#READ, FEATURIZE AND SCORE path chunksize ROWS AT A TIME
+def score_csv(path, score, chunksize, dtype=None, progress=None):
+    start = time.perf_counter()
+    total = count_rows(path)
+    store = None
+
+    for chunk in pd.read_csv(path, dtype=dtype, chunksize=chunksize):
+        scored = score(chunk)
+        if store is None:
+            store = ColumnStore(scored, total)
+        store.append(scored)
+
+        if progress is not None:
+            progress(store.n, total)
+        log.debug('scored %d/%d rows', store.n, total)
+
+    if store is None:
+        return score(pd.read_csv(path, dtype=dtype))
+
+    elapsed = time.perf_counter() - start
+    log.info('ingested %d rows in %.2fs (%.0f rows/s, chunks of %d)', store.n, elapsed, store.n / max(elapsed, 1e-9), chunksize)
+
+    return store.to_frame()
@@ -0,0 +1,41 @@
+import numpy as np
+
+
+#BREAKDOWN KPIS IN ONE PASS
+#every employee falls in one of 8 cells (present, overworked, underpaid), encoded once per
+#extract version as a small int. a filter state is then a single bincount over the selected
+#rows, and every card's number is a sum of cells
+_PRESENT, _OVERWORKED, _UNDERPAID = 4, 2, 1
+
+
+def kpi_cells(df, over_threshold):
+    present = ~df['gone'].to_numpy(dtype=bool)
+    overworked = df['average_monthly_hours'].to_numpy() >= over_threshold
+    underpaid = df['salary_group'].to_numpy() == 1
+    return (present * _PRESENT + overworked * _OVERWORKED + underpaid * _UNDERPAID).astype(np.uint8)
+
+
+def breakdown(cells, rows):
+    n = np.bincount(cells[rows], minlength=8)
+    idx = np.arange(8)
+
+    present = idx & _PRESENT != 0
+    overworked = idx & _OVERWORKED != 0
+    underpaid = idx & _UNDERPAID != 0
+
+    total = n.sum()
+    total_present = n[present].sum()
+    ovw = n[overworked].sum()
+    ovw_present = n[present & overworked].sum()
+
+    return {
+        'total': total,
+        'total_present': total_present,
+        'overworked': ovw,
+        'overworked_present': ovw_present,
+        'overworked_underpaid': n[overworked & underpaid].sum(),
+        'overworked_underpaid_present': n[present & overworked & underpaid].sum(),
+        #an empty selection has no share, NaN without a divide warning per refresh
+        'pct_overworked': ovw / total if total else np.nan,
+        'pct_overworked_present': ovw_present / total_present if total_present else np.nan,
+    }
@@ -0,0 +1,177 @@
+from bisect import bisect_left
+import functools
+import inspect
+import logging
+import os
+import time
+import numpy as np
+import pandas as pd
+from shiny import reactive
+from starlette.responses import PlainTextResponse
+
+
+log = logging.getLogger(__name__)
+
+#calls slower than this are logged, in milliseconds. 0 is no slow log
+_SLOW_MS = float(os.environ.get('CHURN_SLOW_RENDER_MS', 0))
+#CHURN_METRICS=1 (or a slow log) times every instrumented render, reactive calc/effect and
+#model call. off, timed() hands the function back untouched, so nothing is added to a call
+ENABLED = os.environ.get('CHURN_METRICS', '') == '1' or _SLOW_MS > 0
+#upper bounds of the latency buckets, in seconds
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+#LATENCY HISTOGRAM OF ONE INSTRUMENTED FUNCTION, plus the rows it returned
+class Histogram:
+
+    def __init__(self):
+        self.buckets = [0] * (len(_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.rows = 0
+
+    def observe(self, seconds, rows=0):
+        self.buckets[bisect_left(_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.rows += rows
+
+
+#(kind, name) -> Histogram, every session of the process
+CALLS = {}
+#session id -> bytes its selections hold
+SESSIONS = {}
+#(name, stats, label) of the stats() of caches and counters kept elsewhere
+_SOURCES = []
+
+
+#rows in what a call returned: frames, series and arrays, or the first of a tuple of them
+def count_rows(out):
+    if isinstance(out, tuple) and out:
+        out = out[0]
+    return len(out) if isinstance(out, (np.ndarray, pd.Series, pd.DataFrame)) else 0
+
+
+def record(kind, name, seconds, rows=0):
+    h = CALLS.get((kind, name))
+    if h is None:
+        h = CALLS[(kind, name)] = Histogram()
+    h.observe(seconds, rows)
+    if _SLOW_MS and seconds * 1000 >= _SLOW_MS:
+        log.warning('slow %s %s: %.0fms (%s rows)', kind, name, seconds * 1000, rows)
+
+
+#TIME EVERY CALL OF fn UNDER kind ('render', 'calc', 'effect', 'model') AND ITS NAME
+#goes right above the def, under the render/reactive decorators. generators (downloads)
+#are timed until they are exhausted
+def timed(kind, name=None):
+
+    def wrap(fn):
+        if not ENABLED:
+            return fn
+        label = name or fn.__name__
+
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def timed_fn(*args, **kwargs):
+                t = time.perf_counter()
+                try:
+                    async for chunk in fn(*args, **kwargs):
+                        yield chunk
+                finally:
+                    record(kind, label, time.perf_counter() - t)
+        elif inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def timed_fn(*args, **kwargs):
+                t = time.perf_counter()
+                try:
+                    yield from fn(*args, **kwargs)
+                finally:
+                    record(kind, label, time.perf_counter() - t)
+        elif inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_fn(*args, **kwargs):
+                t, out = time.perf_counter(), None
+                try:
+                    out = await fn(*args, **kwargs)
+                    return out
+                finally:
+                    record(kind, label, time.perf_counter() - t, count_rows(out))
+        else:
+            @functools.wraps(fn)
+            def timed_fn(*args, **kwargs):
+                t, out = time.perf_counter(), None
+                try:
+                    out = fn(*args, **kwargs)
+                    return out
+                finally:
+                    record(kind, label, time.perf_counter() - t, count_rows(out))
+        return timed_fn
+
+    return wrap
+
+
+#KEEP held() OF AN OPEN SESSION IN SESSIONS, dropped when the session ends
+def track_session(session, held):
+    if not ENABLED:
+        return
+
+    @reactive.effect
+    def track():
+        SESSIONS[session.id] = held()
+
+    session.on_ended(lambda: SESSIONS.pop(session.id, None))
+
+
+#EXPORT stats() OF A CACHE OR COUNTER UNDER churn_<name>
+#stats() returns {field: number}, one gauge per field, or with label {label value: number}
+def register(name, stats, label=None):
+    _SOURCES.append((name, stats, label))
+
+
+#numpy scalars print as np.float64(...), the format wants the bare number
+def _number(value):
+    return repr(float(value))
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+#PROMETHEUS TEXT FORMAT OF EVERYTHING ABOVE
+def exposition():
+    lines = [
+        '# HELP churn_call_seconds Time spent in instrumented renders, reactive calcs/effects and model calls',
+        '# TYPE churn_call_seconds histogram',
+    ]
+    for (kind, name), h in sorted(CALLS.items()):
+        labels = f'kind="{kind}",name="{_label(name)}"'
+        total = 0
+        for le, n in zip([str(b) for b in _BUCKETS] + ['+Inf'], h.buckets):
+            total += n
+            lines.append(f'churn_call_seconds_bucket{{{labels},le="{le}"}} {total}')
+        lines.append(f'churn_call_seconds_sum{{{labels}}} {h.sum!r}')
+        lines.append(f'churn_call_seconds_count{{{labels}}} {h.count}')
+
+    lines += ['# HELP churn_call_rows_total Rows returned by instrumented calls', '# TYPE churn_call_rows_total counter']
+    for (kind, name), h in sorted(CALLS.items()):
+        lines.append(f'churn_call_rows_total{{kind="{kind}",name="{_label(name)}"}} {h.rows}')
+
+    lines += ['# HELP churn_session_bytes Bytes held by the selections of each open session', '# TYPE churn_session_bytes gauge']
+    for session, held in sorted(SESSIONS.items()):
+        lines.append(f'churn_session_bytes{{session="{_label(session)}"}} {held}')
+
+    for name, stats, label in _SOURCES:
+        values = stats()
+        if label is None:
+            for field, v in values.items():
+                lines += [f'# TYPE churn_{name}_{field} gauge', f'churn_{name}_{field} {_number(v)}']
+        else:
+            lines.append(f'# TYPE churn_{name} gauge')
+            lines += [f'churn_{name}{{{label}="{_label(k)}"}} {_number(v)}' for k, v in sorted(values.items())]
+    return '\n'.join(lines) + '\n'
+
+
+#GET /metrics, see serve.py
+async def endpoint(request):
+    return PlainTextResponse(exposition(), media_type='text/plain; version=0.0.4')
@@ -0,0 +1,112 @@
+from collections import OrderedDict
+import hashlib
+import logging
+import os
+import numpy as np
+from shiny.render import plot
+from metrics import register
+from shiny.session import require_active_session
+
+
+log = logging.getLogger(__name__)
+
+#rendered images kept across sessions, in MB of PNG data
+_CACHE_MB = float(os.environ.get('CHURN_RENDER_CACHE_MB', 64))
+
+
+#NORMALIZED HASH OF WHATEVER A PLOT DEPENDS ON
+#lists and sets are order-free (ticked departments), tuples keep their order (ranges),
+#arrays hash by content (row selections)
+def state_hash(state):
+    h = hashlib.sha1()
+
+    def feed(x):
+        if isinstance(x, np.ndarray):
+            h.update(f'a{x.dtype}{x.shape}'.encode())
+            h.update(np.ascontiguousarray(x).tobytes())
+        elif isinstance(x, (list, set, frozenset)):
+            h.update(b'[')
+            for v in sorted(x, key=repr):
+                feed(v)
+            h.update(b']')
+        elif isinstance(x, tuple):
+            h.update(b'(')
+            for v in x:
+                feed(v)
+            h.update(b')')
+        else:
+            h.update(repr(x).encode())
+        h.update(b',')
+
+    feed(state)
+    return h.hexdigest()
+
+
+#LRU OF RENDERED IMAGES SHARED BY EVERY SESSION
+class RenderCache:
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        img = self.items.get(key)
+        if img is None:
+            self.misses += 1
+            return None
+        self.items.move_to_end(key)
+        self.hits += 1
+        return img
+
+    def put(self, key, img):
+        size = len(img.get('src', ''))
+        if size > self.max_bytes:
+            return
+        if key in self.items:
+            self.nbytes -= len(self.items.pop(key).get('src', ''))
+        self.items[key] = img
+        self.nbytes += size
+
+        while self.nbytes > self.max_bytes:
+            _, old = self.items.popitem(last=False)
+            self.nbytes -= len(old.get('src', ''))
+            self.evictions += 1
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self.items), 'bytes': self.nbytes}
+
+
+render_cache = RenderCache(int(_CACHE_MB * 2**20))
+register('render_cache', render_cache.stats)
+
+
+#render.plot THAT REUSES AN IMAGE ANY SESSION ALREADY RENDERED FOR THE SAME VIEW
+#state() must read every reactive the plot depends on, it replaces the plot function
+#as the source of dependencies whenever the image comes from the cache
+class cached_plot(plot):
+
+    def __init__(self, _fn=None, *, state=lambda: None, **kwargs):
+        self.state = state
+        super().__init__(_fn, **kwargs)
+
+    async def render(self):
+        session = require_active_session(None)
+        inputs = session.root_scope().input
+        name = session.ns(self.output_id)
+
+        size = (
+            inputs[f'.clientdata_output_{name}_width'](),
+            inputs[f'.clientdata_output_{name}_height'](),
+            inputs['.clientdata_pixelratio'](),
+        )
+        key = (self.output_id, state_hash(self.state()), size)
+
+        img = render_cache.get(key)
+        if img is None:
+            img = await super().render()
+            if img is not None:
+                render_cache.put(key, img)
+            log.debug('render cache miss %s %s', self.output_id, render_cache.stats())
+        return img
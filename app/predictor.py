@@ -0,0 +1,140 @@
+from collections import OrderedDict
+import logging
+import time
+import numpy as np
+from features import _FEATURES, salary_band
+
+
+log = logging.getLogger(__name__)
+
+
+#ONE CALCULATOR PROFILE -> FEATURE TUPLE, the same values featurize() produces for a one-row frame
+#flags go through bool() like featurize's to_numpy(dtype=bool) does, so a select's
+#'False' string still counts as set
+def profile_key(last_evaluation, number_project, average_monthly_hours, time_spend_company, work_accident, promotion_last_5years, salary):
+    num = lambda x: np.nan if x is None else float(x)
+    return (
+        num(last_evaluation) / 10.0,
+        float(bool(work_accident)),
+        num(number_project),
+        num(average_monthly_hours),
+        num(time_spend_company),
+        float(bool(promotion_last_5years)),
+        float(salary_band(num(salary)))
+    )
+
+
+#CALCULATOR INPUT -> (MODEL FEATURE COLUMN, FEATURE VALUES), profile_key over an array of values
+def feature_values(name, values):
+    values = np.asarray(values)
+    if name == 'last_evaluation':
+        return _FEATURES.index(name), values.astype('float64') / 10.0
+    if name in ('work_accident', 'promotion_last_5years'):
+        return _FEATURES.index(name), np.array([bool(v) for v in values.ravel()], dtype='float64').reshape(values.shape)
+    if name == 'salary':
+        return _FEATURES.index(name), salary_band(values.astype('float64')).astype('float64')
+    return _FEATURES.index(name), values.astype('float64')
+
+
+#WHAT-IF SWEEP: a profile with one or two of its inputs replaced by every point of a grid,
+#all scored in one batch. axes maps a profile_key argument name to its values (as the
+#calculator takes them), the probabilities come back shaped (len(values), ...) in axes order
+def sweep(compiled, profile, axes):
+    grids = np.meshgrid(*[np.asarray(v) for v in axes.values()], indexing='ij')
+    X = np.tile(np.array(profile_key(*profile)), (grids[0].size, 1))
+    for name, grid in zip(axes, grids):
+        col, values = feature_values(name, grid.ravel())
+        X[:, col] = values
+    return compiled.predict(X).reshape(grids[0].shape)
+
+
+#values of a sweep curve where it crosses threshold (leaving from threshold up, like
+#leaving_label), interpolated between grid points, or
+#the first grid value past each crossing for inputs that only take the grid's values, or for
+#inputs the model only sees through bands (salary) the band edge each crossing steps over
+def crossings(values, probs, threshold, interpolate=True, edges=None):
+    values, above = np.asarray(values, dtype='float64'), np.asarray(probs) >= threshold
+    at = np.flatnonzero(above[1:] != above[:-1])
+    if edges is not None:
+        edges = np.asarray(edges, dtype='float64')
+        return edges[np.searchsorted(edges, values[at + 1], side='right') - 1]
+    if not interpolate:
+        return values[at + 1]
+    p0, p1 = probs[at].astype('float64'), probs[at + 1].astype('float64')
+    return values[at] + (threshold - p0) / (p1 - p0) * (values[at + 1] - values[at])
+
+
+#SINGLE-PROFILE PREDICTIONS WITHOUT PANDAS/SKLEARN IN THE WAY
+#the scaler's mean/scale are applied in place on a preallocated row that goes straight to
+#the compiled trees. answers are kept in an LRU keyed on the feature tuple, and the time of
+#the last calls is kept in a ring for latency percentiles.
+#attributions (contributions()) get an LRU of their own, a profile is often predicted
+#without being explained
+class SinglePredictor:
+
+    def __init__(self, compiled, maxsize=4096, window=1024):
+        self.compiled = compiled
+        self.mean = compiled.mean
+        self.scale = compiled.scale
+        self.row = np.empty((1, len(_FEATURES)), dtype='float64')
+
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.hits = self.misses = 0
+        self.explained = OrderedDict()
+
+        self.latency = np.zeros(window)
+        self.calls = 0
+
+    def __call__(self, *profile):
+        t = time.perf_counter()
+        key = profile_key(*profile)
+
+        prob = self.items.get(key)
+        if prob is None:
+            self.misses += 1
+            self.row[0] = key
+            self.row -= self.mean
+            self.row /= self.scale
+            prob = self.compiled.predict_scaled(self.row)[0]
+
+            self.items[key] = prob
+            if len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+        else:
+            self.hits += 1
+            self.items.move_to_end(key)
+
+        self.latency[self.calls % len(self.latency)] = time.perf_counter() - t
+        self.calls += 1
+        log.debug('single prediction %s', self.stats())
+        return prob
+
+    #float32 attributions of one profile, see CompiledModel.contributions_scaled
+    def contributions(self, *profile):
+        key = profile_key(*profile)
+
+        contrib = self.explained.get(key)
+        if contrib is None:
+            self.row[0] = key
+            self.row -= self.mean
+            self.row /= self.scale
+            contrib = self.compiled.contributions_scaled(self.row)[0]
+
+            self.explained[key] = contrib
+            if len(self.explained) > self.maxsize:
+                self.explained.popitem(last=False)
+        else:
+            self.explained.move_to_end(key)
+        return contrib
+
+    def stats(self):
+        recent = self.latency[:min(self.calls, len(self.latency))] * 1e6
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / max(self.hits + self.misses, 1),
+            'entries': len(self.items),
+            'p50_us': float(np.percentile(recent, 50)) if len(recent) else 0.0,
+            'p99_us': float(np.percentile(recent, 99)) if len(recent) else 0.0,
+        }
@@ -0,0 +1,73 @@
+import pandas as pd
+
+
+#COMPACT COLUMN TYPES APPLIED AT LOAD TIME
+#flags stay numpy bool (1 byte, same as int8) so ~mask keeps working. measures from the extract
+#and prob are shown and exported as they are, so they stay float64; only lossless integer types
+#and the derived labels/groups are narrowed
+MAIN_SCHEMA = {
+            'id': 'int32',
+            'time_spend_company': 'float64',
+            'number_project': 'int8',
+            'average_monthly_hours': 'float64',
+            'satisfaction_level': 'float64',
+            'last_evaluation': 'float64',
+            'promotion_last_5years': 'bool',
+            'work_accident': 'bool',
+            'department': 'category',
+            'salary_amount': 'int32',
+            'gone': 'bool',
+            'prob': 'float64',
+            'Leaving/Staying': pd.CategoricalDtype(['Leaving', 'Staying']),
+            'salary_group': 'int8',
+            'satisfaction_group': pd.CategoricalDtype(['Bad', 'Neutral', 'Good'], ordered=True)
+}
+
+SURVEY_SCHEMA = {
+            'Employee Name': 'category',
+            'Employee ID': 'int32',
+            'Department': 'category',
+            'Work-Life Balance': 'int8',
+            'Salary': 'int8',
+            'Management': 'int8',
+            'Workload': 'int8',
+            'Growth Opportunities': 'int8',
+            'Satisfaction Score': 'int8'
+}
+
+
+def apply_schema(df, schema):
+    return df.astype({c: t for c, t in schema.items() if c in df.columns})
+
+
+#GIVE CATEGORICAL COLUMNS SHARED BY a AND b THE SAME (SORTED) CATEGORIES SO THEY CAN BE MIXED
+def unify_categories(a, b):
+    for c in a.columns.intersection(b.columns):
+        if isinstance(a[c].dtype, pd.CategoricalDtype) and isinstance(b[c].dtype, pd.CategoricalDtype) and a[c].dtype != b[c].dtype:
+            cats = a[c].cat.categories.union(b[c].cat.categories)
+            a[c] = a[c].cat.set_categories(cats, ordered=a[c].cat.ordered)
+            b[c] = b[c].cat.set_categories(cats, ordered=a[c].cat.ordered)
+
+
+def memory_report(before, after):
+    report = pd.DataFrame({
+                'before': before.memory_usage(index=False, deep=True),
+                'after': after.memory_usage(index=False, deep=True)
+            })
+    report.loc['TOTAL'] = report.sum()
+    report['dtype'] = list(after.dtypes.astype(str)) + ['']
+    report['ratio'] = (report['after'] / report['before']).round(3)
+    return report
+
+
+if __name__ == '__main__':
+    import shared
+
+    raw_main = shared.score_employees(shared.read_employees(), compact=False)
+    raw_survey = shared.read_survey(compact=False)
+
+    print('df_main (bytes)')
+    print(memory_report(raw_main, apply_schema(raw_main, MAIN_SCHEMA)))
+    print()
+    print('df_survey (bytes)')
+    print(memory_report(raw_survey, apply_schema(raw_survey, SURVEY_SCHEMA)))
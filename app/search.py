@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+
+_N = 3
+_BLOCK = 1 << 18
+
+
+#SUBSTRING / PREFIX SEARCH OVER ONE TEXT COLUMN
+#contains() intersects trigram posting lists and verifies the few candidates left,
+#startswith() is a binary search over the sorted values. a query as long as the longest
+#value can only match from the start, so contains() answers it with startswith().
+#both return sorted row positions, optionally restricted to the positions in within
+class TextIndex:
+
+    def __init__(self, values):
+        self.values = pd.Series(values).astype(str).str.lower().to_numpy(dtype=object)
+        self.n = len(self.values)
+        self.max_len = max(map(len, self.values), default=0)
+
+        self.sorted_rows = np.argsort(self.values, kind='stable')
+        self.sorted_values = self.values[self.sorted_rows]
+
+        #characters -> small codes so a trigram fits in 32 bits (0 is padding)
+        self.alphabet = np.array(sorted(map(ord, set(''.join(self.values)))), dtype=np.uint32)
+        self.k = len(self.alphabet) + 1
+
+        pairs = [self._pairs(start) for start in range(0, self.n, _BLOCK)]
+        pairs = np.sort(np.concatenate(pairs)) if pairs else np.empty(0, dtype=np.uint64)
+
+        grams = (pairs >> np.uint64(32)).astype(np.uint32)
+        self.keys, starts = np.unique(grams, return_index=True)
+        self.offsets = np.append(starts, len(grams))
+        self.postings = (pairs & np.uint64(0xFFFFFFFF)).astype(np.int32)
+
+    def _codes(self, strings):
+        fixed = np.asarray(strings, dtype=str)
+        if fixed.dtype.itemsize < 4 * _N:
+            fixed = fixed.astype(f'U{_N}')
+        points = fixed.view(np.uint32).reshape(len(fixed), -1)
+        codes = np.searchsorted(self.alphabet, points).astype(np.uint64) + np.uint64(1)
+        codes[points == 0] = 0
+        return codes
+
+    def _grams(self, chars):
+        k = np.uint64(self.k)
+        grams = (chars[:, :-2] * k + chars[:, 1:-1]) * k + chars[:, 2:]
+        #codes that overflow 32 bits only collide, verification removes the false hits
+        return grams & np.uint64(0xFFFFFFFF), chars[:, 2:] != 0
+
+    #(trigram << 32 | row) for every distinct trigram of rows start..start+_BLOCK
+    def _pairs(self, start):
+        chars = self._codes(self.values[start:start + _BLOCK])
+        grams, valid = self._grams(chars)
+        rows = np.broadcast_to(np.arange(start, start + len(chars), dtype=np.uint64)[:, None], grams.shape)
+        return np.unique((grams[valid] << np.uint64(32)) | rows[valid])
+
+    def _posting(self, gram):
+        i = np.searchsorted(self.keys, gram)
+        if i == len(self.keys) or self.keys[i] != gram:
+            return np.empty(0, dtype=np.int32)
+        return self.postings[self.offsets[i]:self.offsets[i + 1]]
+
+    def _scan(self, q, rows):
+        return rows[np.fromiter((q in v for v in self.values[rows]), dtype=bool, count=len(rows))]
+
+    def contains(self, q, within=None):
+        q = str(q).lower()
+        rows = np.arange(self.n) if within is None else np.asarray(within)
+
+        if len(q) >= self.max_len and q:
+            return self.startswith(q, within)
+        if len(q) < _N:
+            return self._scan(q, rows) if q else rows
+        if not np.isin(np.array([ord(c) for c in q], dtype=np.uint32), self.alphabet).all():
+            return rows[:0]
+
+        grams, _ = self._grams(self._codes([q]))
+        lists = sorted((self._posting(g) for g in np.unique(grams)), key=len)
+
+        cand = lists[0]
+        for p in lists[1:]:
+            if len(cand) == 0:
+                break
+            cand = np.intersect1d(cand, p, assume_unique=True)
+
+        if within is not None:
+            cand = np.intersect1d(cand, rows, assume_unique=True)
+        return self._scan(q, cand)
+
+    def startswith(self, q, within=None):
+        q = str(q).lower()
+        a = np.searchsorted(self.sorted_values, q, side='left')
+        b = np.searchsorted(self.sorted_values, q + '\U0010ffff', side='left')
+        found = np.sort(self.sorted_rows[a:b])
+
+        if within is not None:
+            found = np.intersect1d(found, within, assume_unique=True)
+        return found
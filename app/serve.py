@@ -0,0 +1,15 @@
+# shiny_mode: core
+from pathlib import Path
+from shiny.express import wrap_express_app
+from starlette.applications import Starlette
+from starlette.routing import Mount, Route
+import metrics
+
+
+#THE DASHBOARD WITH A PROMETHEUS /metrics ROUTE NEXT TO IT
+#shiny run app/serve.py instead of app/app.py. the route is always there (cache and filter
+#counters), CHURN_METRICS=1 adds the latency histograms, CHURN_SLOW_RENDER_MS=<ms> logs slow calls
+app = Starlette(routes=[
+    Route('/metrics', metrics.endpoint),
+    Mount('/', app=wrap_express_app(Path(__file__).parent / 'app.py')),
+])
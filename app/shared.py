@@ -1,47 +1,110 @@
 from pathlib import Path
 import pandas as pd
-import datetime
-try:
-    import pickle
-except ImportError:
-    import cloudpickle as pickle
-from sklearn.ensemble import RandomForestClassifier
-from xgboost import XGBClassifier
 import numpy as np
+from features import featurize, gone_mask, leaving_label
+from snapshot import content_hash, load_or_build, store
+from incremental import apply_delta
+from ingest import score_csv
+from batch import score_file
+from predictor import SinglePredictor, profile_key, sweep
+from compiled import CompiledModel, compile_model, check_parity
+from schema import MAIN_SCHEMA, SURVEY_SCHEMA, apply_schema
+from filters import EmployeeIndex, SurveyIndex
+from search import TextIndex
+from kpis import kpi_cells
+from cube import ChurnCube
+from tables import SortIndex
+from surveys import SurveyStore
+from thresholds import ThresholdIndex
+from comments import CommentIndex
+from metrics import timed, register
+from shiny import reactive
+import os
 
 
+#default Leaving/Staying cut-off, the one baked into the snapshot. sessions move theirs with the
+#Overview slider, see thresholds.py
 _THRESHOLD = .6
+#monthly hours from which an employee counts as overworked
+_OVER_THRESHOLD = 240
 app_dir = Path(__file__).parent
+cache_dir = Path(os.environ.get('CHURN_CACHE_DIR', app_dir / '.cache'))
+
+_RAW_COLS = [
+            'id',
+            'name',
+            'time_spend_company',
+            'number_project',
+            'average_monthly_hours',
+            'satisfaction_level',
+            'last_evaluation',
+            'promotion_last_5years',
+            'work_accident',
+            'department',
+            'salary_amount',
+            'gone'
+            ]
+
+
+_RAW_DTYPES = {'average_monthly_hours': float, 'last_evaluation': float, 'time_spend_company': float, 'salary': int}
+
+#rows per chunk when scoring the extract, bounds peak memory during a full build
+_CHUNK_SIZE = int(os.environ.get('CHURN_CHUNK_SIZE', 250000))
+#rows per vectorized batch when scoring an uploaded CSV of profiles
+_BATCH_SIZE = int(os.environ.get('CHURN_BATCH_SIZE', 20000))
+#calculator profiles whose prediction is remembered
+_PREDICT_CACHE = int(os.environ.get('CHURN_PREDICT_CACHE', 4096))
+
+
+def read_employees():
+    return pd.read_csv(app_dir / "rawraw.csv", dtype=_RAW_DTYPES)
+
+
+def df_main_key():
+    return content_hash(app_dir / 'rawraw.csv', app_dir / 'model.pkl', app_dir / 'fitted_scaler.pkl', extra=[_THRESHOLD, 'compiled'])
+
 
 #LOAD MODEL/SCALER
-with open(app_dir / 'model.pkl', 'rb') as f:
-    model = pickle.load(f)
-with open(app_dir / 'fitted_scaler.pkl', 'rb') as f:
-    scaler = pickle.load(f)
+#scoring runs on the compiled arrays (see compiled.py), kept next to the snapshots. the pickles,
+#and with them xgboost/sklearn, are only loaded when model.pkl or fitted_scaler.pkl change
+def compile_pickled():
+    try:
+        import pickle
+    except ImportError:
+        import cloudpickle as pickle
 
+    with open(app_dir / 'model.pkl', 'rb') as f:
+        model = pickle.load(f)
+    with open(app_dir / 'fitted_scaler.pkl', 'rb') as f:
+        scaler = pickle.load(f)
 
-#PROCESS df_main:
-def get_df_main():
+    compiled = compile_model(model, scaler)
+    check_parity(compiled, model, scaler, featurize(read_employees()))
+    return compiled
+
+_model_key = content_hash(app_dir / 'model.pkl', app_dir / 'fitted_scaler.pkl')
+compiled = CompiledModel.load(cache_dir / f'model-{_model_key}.npz')
+if compiled is None:
+    compiled = compile_pickled()
+    compiled.save(cache_dir / f'model-{_model_key}.npz')
 
-    df = pd.read_csv(app_dir / "rawraw.csv", dtype= {'average_monthly_hours': float, 'last_evaluation': float, 'time_spend_company': float, 'salary': int})
 
-    def transform_row(row):
-        return {
-            'last_evaluation': row['last_evaluation'] / 10.0,
-            'work_accident': 1 if row['work_accident'] else 0,
-            'number_project': row['number_project'],
-            'average_monthly_hours': row['average_monthly_hours'],
-            'time_spend_company': row['time_spend_company'],
-            'promotion_last_5years': 1 if row['promotion_last_5years'] else 0,
-            'salary': 0 if row['salary_amount'] < 12000000 else 1 if row['salary_amount'] < 20000000 else 2
-        }
+#MODEL FEATURES -> PROBABILITY OF LEAVING
+@timed('model')
+def predict_leaving(features):
+    return compiled.predict(features)
+
+
+#PROCESS df_main:
+@timed('model')
+def score_employees(df, compact=True):
 
-    transformed_df = df.apply(transform_row, axis=1, result_type='expand')
+    transformed_df = featurize(df)
 
-    df['prob'] = model.predict_proba(scaler.transform(transformed_df))[:,1]
-    df['prob'] = df.apply(lambda x: None if x['gone'] else x['prob'], axis=1)
+    df['prob'] = predict_leaving(transformed_df)
+    df.loc[gone_mask(df), 'prob'] = np.nan
 
-    df['Leaving/Staying'] = df['prob'].apply(lambda x: 'Staying' if x < _THRESHOLD else 'Leaving' if pd.notna(x) else None)
+    df['Leaving/Staying'] = leaving_label(df['prob'], _THRESHOLD)
     df['salary_group'] = transformed_df['salary'].astype(int)
 
     bins = [0, 5, 7, 10] 
@@ -70,35 +133,196 @@ def get_df_main():
     
     # df['department'] = df['department'].map(dept_map)
     # df['left'] = df['left'].map(left_map)
-    return df
+    return apply_schema(df, MAIN_SCHEMA) if compact else df
+
+@timed('model')
+def get_df_main():
+    return score_csv(app_dir / "rawraw.csv", score_employees, _CHUNK_SIZE, dtype=_RAW_DTYPES)
 
 #LOAD CSVs
-date_parser = lambda x: datetime.datetime.strptime(x, '%d/%m/%Y')
-df_survey = pd.read_csv(app_dir / "survey.csv", parse_dates=['Date'], date_parser=date_parser)
+#dates are parsed for the whole column at once in the survey's day-first format
+@timed('calc')
+def read_survey(compact=True):
+    df = pd.read_csv(app_dir / "survey.csv")
+    df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y')
+    return apply_schema(df, SURVEY_SCHEMA) if compact else df
+
+df_survey = load_or_build('df_survey', content_hash(app_dir / 'survey.csv'), read_survey, cache_dir)
 df_in_out = pd.read_csv(app_dir / "in_out.csv", dtype=int)
-df_main = get_df_main()
+_df_main_key = df_main_key()
+df_main = load_or_build('df_main', _df_main_key, get_df_main, cache_dir)
 df_salaries = pd.read_csv(app_dir / "salaries.csv")
 
 _DEPT_LIST = list(df_main['department'].unique())
 
 
+#RESCORE ONLY WHAT CHANGED WHEN THE EXTRACT IS UPDATED
+#module level, so one watcher is shared by every session reading employees()
+@reactive.file_reader(app_dir / 'rawraw.csv', session=None)
+@timed('calc')
+def employees():
+    global df_main, _df_main_key
+
+    key = df_main_key()
+    if key != _df_main_key:
+        df_main, _ = apply_delta(df_main, read_employees(), score_employees, _RAW_COLS)
+        _DEPT_LIST[:] = list(df_main['department'].unique())
+        store('df_main', key, df_main, cache_dir)
+        _df_main_key = key
+
+    return df_main
+
+
+#CONTENT KEY OF THE FRAME employees() RETURNS, for caches keyed on the data version
+def employees_key():
+    employees()
+    return _df_main_key
+
+
+#FILTER INDEXES, rebuilt once per extract version and shared by every session
+@reactive.calc(session=None)
+@timed('calc')
+def employee_index():
+    return EmployeeIndex(employees())
+
+survey_index = SurveyIndex(df_survey)
+
+
+#NAME/ID SEARCH INDEXES, built on first search
+@reactive.calc(session=None)
+@timed('calc')
+def employee_search():
+    df = employees()
+    return {'name': TextIndex(df['name']), 'id': TextIndex(df['id'])}
+
+survey_search = {'Employee Name': TextIndex(df_survey['Employee Name']), 'Employee ID': TextIndex(df_survey['Employee ID'])}
+
+
+#SORT PERMUTATIONS OF THE DATA TABS, built per column on first sort and shared by every session
+@reactive.calc(session=None)
+@timed('calc')
+def employee_sort():
+    return SortIndex(employees())
+
+survey_sort = SortIndex(df_survey)
+
+
+#MONTHLY SURVEY BUCKETS THE DRIVER KPIS AND CHART ARE ANSWERED FROM, see surveys.py
+_SURVEY_DRIVERS = ['Work-Life Balance', 'Salary', 'Management', 'Workload', 'Growth Opportunities', 'Satisfaction Score']
+survey_store = SurveyStore(df_survey, _SURVEY_DRIVERS)
+
+
+#INVERTED INDEX OVER THE SURVEY COMMENTS (search and per-department terms), see comments.py
+#tokenizing is the slow part of a large extract, so the built index is snapshotted like the frame
+@timed('calc')
+def build_comment_index():
+    return CommentIndex(df_survey['Comments'], df_survey['Department'])
+
+comment_index = load_or_build('comment_index', content_hash(app_dir / 'survey.csv'), build_comment_index, cache_dir)
+
+
+#BREAKDOWN KPI CELL PER EMPLOYEE, see kpis.py
+@reactive.calc(session=None)
+@timed('calc')
+def employee_kpi_cells():
+    return kpi_cells(employees(), _OVER_THRESHOLD)
+
+
+#AGGREGATE CUBE THE OVERVIEW/BREAKDOWN PLOTS READ INSTEAD OF EMPLOYEE ROWS
+@reactive.calc(session=None)
+@timed('calc')
+def churn_cube():
+    return ChurnCube(employees())
+
+
+#PER-DEPARTMENT SORTED PROBABILITIES, Leaving/Staying counts at the threshold a session picks
+@reactive.calc(session=None)
+@timed('calc')
+def threshold_index():
+    return ThresholdIndex(employees())
+
+
+#BYTES HELD BY A VALUE: arrays, frames (deep) and containers of them, for the session memory gauge
+def nbytes(x):
+    if isinstance(x, np.ndarray):
+        return x.nbytes
+    if isinstance(x, (pd.DataFrame, pd.Series)):
+        return int(x.memory_usage(deep=True).sum()) if isinstance(x, pd.DataFrame) else int(x.memory_usage(deep=True))
+    if isinstance(x, (list, tuple, set)):
+        return sum(nbytes(v) for v in x)
+    if isinstance(x, dict):
+        return sum(nbytes(v) for v in x.values())
+    return 0
+
+
+#TABLES EVERY SESSION READS FROM, measured once per extract version
+_survey_bytes = nbytes(df_survey)
+
+@reactive.calc(session=None)
+@timed('calc')
+def table_bytes():
+    return {'employees': nbytes(employees()), 'survey': _survey_bytes}
+
+
 
 def process_inputs(last_evaluation, number_project, average_monthly_hours, time_spend_company, work_accident, promotion_last_5years, salary):
 
-    temp = pd.DataFrame([{
-            'last_evaluation': last_evaluation/10.0,
-            'work_accident': 1 if work_accident else 0,
+    temp = featurize(pd.DataFrame([{
+            'last_evaluation': last_evaluation,
+            'work_accident': work_accident,
             'number_project': number_project,
             'average_monthly_hours': average_monthly_hours,
             'time_spend_company': time_spend_company,
-            'promotion_last_5years': 1 if promotion_last_5years else 0,
-            'salary': 0 if salary < 12000000 else 1 if salary < 20000000 else 2
-        }])
+            'promotion_last_5years': promotion_last_5years,
+            'salary_amount': salary
+        }]))
+
+    return compiled.transform(temp)
+
+#SAME PREDICTION AS predict_leaving(featurize(...)) FOR ONE PROFILE, see predictor.py
+#returns the probability of leaving
+predict_profile = SinglePredictor(compiled, _PREDICT_CACHE)
+register('predict_profile', predict_profile.stats)
+
+#PER-FEATURE ATTRIBUTIONS OF EVERY CURRENT EMPLOYEE, one batch per extract version
+#float32 (rows x features + 1) aligned to the positions of employees(), NaN for past employees
+#like their probability, plus a row position for every current employee's feature tuple.
+#employees() holds the extract's measures losslessly (see schema.py), so these are the features
+#score_employees scored and the keys equal profile_key of the values typed into the calculator
+@reactive.calc(session=None)
+@timed('model')
+def employee_attributions():
+    df = employees()
+    features = featurize(df)
+    current = ~gone_mask(df)
+
+    contrib = compiled.contributions(features)
+    contrib[~current] = np.nan
+    rows = np.flatnonzero(current)
+    known = dict(zip(map(tuple, features.to_numpy(dtype='float64')[rows].tolist()), rows.tolist()))
+    return contrib, known
 
-    return scaler.transform(temp)
+#ATTRIBUTIONS OF ONE CALCULATOR PROFILE, looked up when it is a current employee's and
+#computed (and cached) by predict_profile otherwise. same columns as employee_attributions
+@timed('model')
+def explain_profile(*profile):
+    contrib, known = employee_attributions()
+    row = known.get(profile_key(*profile))
+    return contrib[row] if row is not None else predict_profile.contributions(*profile)
 
-def beau_column_names(which_one=True):
-    rename_dict = {
+#WHAT-IF SWEEP OF ONE CALCULATOR PROFILE, one batched model call for the whole grid, see predictor.py
+@timed('model')
+def sweep_profile(profile, axes):
+    return sweep(compiled, profile, axes)
+
+#SCORE AN UPLOADED CSV OF CALCULATOR PROFILES, see batch.py
+@timed('model')
+def score_upload(path, threshold=_THRESHOLD):
+    return score_file(path, predict_leaving, threshold, _BATCH_SIZE)
+
+
+#DISPLAY NAMES, only applied to what is rendered or exported
+DISPLAY_NAMES = {
             'id': 'Employee ID',
             'name': 'Employee Name',
             'time_spend_company': 'Years since Onboarding',
@@ -112,9 +336,18 @@ def beau_column_names(which_one=True):
             'prob': 'Probability of Leaving',
             'department': 'Department',
             'gone': 'Departed'
-    }
+}
+
 
-    return df_main.rename(columns = rename_dict)
+def beau_column_names(df):
+    return df.rename(columns = DISPLAY_NAMES)
+
+
+#GATHER rows (positions) AND OPTIONALLY A FEW cols IN ONE STEP, WITHOUT COPYING THE WHOLE TABLE
+def take(df, rows, cols=None):
+    if cols is None:
+        return df.iloc[rows]
+    return df.iloc[rows, df.columns.get_indexer(cols)]
 
 
 _COLS_TO_DROP = [
@@ -122,4 +355,7 @@ _COLS_TO_DROP = [
                 'satisfaction_group',
                 'Leaving/Staying',
                 'salary_group'
-                ]
\ No newline at end of file
+                ]
+
+#COLUMNS OF THE EMPLOYEE DATA TABLE AND EXPORT, in frame order
+_MAIN_TABLE_COLS = [c for c in df_main.columns if c not in _COLS_TO_DROP]
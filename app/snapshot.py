@@ -0,0 +1,61 @@
+from pathlib import Path
+import hashlib
+import os
+import tempfile
+import pandas as pd
+
+
+#bump when the layout of the scored frame changes so old snapshots are not reused
+_SNAPSHOT_VERSION = 3
+_CHUNK = 1 << 20
+
+
+def content_hash(*paths, extra=()):
+    h = hashlib.sha256(f'v{_SNAPSHOT_VERSION}'.encode())
+    for p in paths:
+        with open(p, 'rb') as f:
+            for block in iter(lambda: f.read(_CHUNK), b''):
+                h.update(block)
+    for e in extra:
+        h.update(repr(e).encode())
+    return h.hexdigest()[:32]
+
+
+def load(name, key, cache_dir):
+    try:
+        return pd.read_pickle(Path(cache_dir) / f'{name}-{key}.pkl')
+    except Exception:
+        #missing, corrupt or unreadable snapshot, caller rebuilds it
+        return None
+
+
+#PUBLISH df AS THE SNAPSHOT FOR key ATOMICALLY AND DROP OLDER ONES
+def store(name, key, df, cache_dir):
+    cache_dir = Path(cache_dir)
+    path = cache_dir / f'{name}-{key}.pkl'
+
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, prefix=f'.{name}-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pd.to_pickle(df, f)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        for stale in cache_dir.glob(f'{name}-*.pkl'):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+    except OSError:
+        #read-only deployments still work, they just pay the cold start every time
+        pass
+
+
+def load_or_build(name, key, build, cache_dir):
+    df = load(name, key, cache_dir)
+    if df is None:
+        df = build()
+        store(name, key, df, cache_dir)
+    return df
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+#SURVEY RESPONSES PARTITIONED BY MONTH
+#rows are grouped by the month they were answered in (order/offsets give each month's rows
+#without moving the frame) and every (month, department) bucket keeps a response count and
+#the sum of each driver. a department/date filter then adds up the buckets of the months it
+#covers in full and only reads the rows of the (at most two) months it cuts through
+class SurveyStore:
+
+    def __init__(self, df, drivers):
+        self.drivers = list(drivers)
+        self.dates = df['Date'].to_numpy(dtype='datetime64[ns]')
+        self.departments = df['Department'].cat.categories
+        self.dept = df['Department'].cat.codes.to_numpy()
+        self.values = df[self.drivers].to_numpy(dtype='float64')
+
+        month = self.dates.astype('datetime64[M]')
+        self.months = np.unique(month)
+        part = np.searchsorted(self.months, month)
+        self.order = np.argsort(part, kind='stable')
+        self.offsets = np.searchsorted(part[self.order], np.arange(len(self.months) + 1))
+
+        m, d = len(self.months), len(self.departments)
+        cell = part * d + self.dept
+        self.counts = np.bincount(cell, minlength=m * d).reshape(m, d)
+        self.sums = np.stack([np.bincount(cell, weights=self.values[:, i], minlength=m * d) for i in range(len(self.drivers))], axis=-1).reshape(m, d, -1)
+
+    def partition(self, i):
+        return self.order[self.offsets[i]:self.offsets[i + 1]]
+
+    def _rows(self, rows):
+        d = len(self.departments)
+        counts = np.bincount(self.dept[rows], minlength=d)
+        sums = np.stack([np.bincount(self.dept[rows], weights=self.values[rows, i], minlength=d) for i in range(len(self.drivers))], axis=-1)
+        return counts, sums
+
+    #response count and driver sums per department for the responses dated within dates
+    #(inclusive, None is every date) from the departments in depts (None is every department)
+    def totals(self, depts=None, dates=None):
+        if dates is None:
+            counts, sums = self.counts.sum(axis=0), self.sums.sum(axis=0)
+        else:
+            start, end = np.datetime64(dates[0], 'ns'), np.datetime64(dates[1], 'ns')
+            first, last = start.astype('datetime64[M]'), end.astype('datetime64[M]')
+
+            #months strictly inside the range come from the buckets
+            a = np.searchsorted(self.months, first, side='right')
+            b = np.searchsorted(self.months, last, side='left')
+            counts, sums = self.counts[a:b].sum(axis=0), self.sums[a:b].sum(axis=0)
+
+            #the edge months from their rows
+            edges = {i for i in np.searchsorted(self.months, [first, last]) if i < len(self.months) and self.months[i] in (first, last)}
+            if edges and start <= end:
+                rows = np.concatenate([self.partition(i) for i in sorted(edges)])
+                rows = rows[(self.dates[rows] >= start) & (self.dates[rows] <= end)]
+                c, s = self._rows(rows)
+                counts, sums = counts + c, sums + s
+
+        if depts is not None:
+            keep = self.departments.isin(depts)
+            counts, sums = np.where(keep, counts, 0), np.where(keep[:, None], sums, 0)
+        return counts, sums
+
+    #{driver: mean} over the filtered responses
+    def means(self, depts=None, dates=None):
+        counts, sums = self.totals(depts, dates)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return dict(zip(self.drivers, sums.sum(axis=0) / counts.sum()))
+
+    #Department and one mean per driver, for the departments with responses
+    def department_means(self, depts=None, dates=None, drivers=None):
+        counts, sums = self.totals(depts, dates)
+        drivers = drivers or self.drivers
+        has = counts > 0
+
+        out = pd.DataFrame({'Department': pd.Categorical(self.departments[has], categories=self.departments)})
+        for c in drivers:
+            out[c] = sums[has, self.drivers.index(c)] / counts[has]
+        return out
@@ -0,0 +1,73 @@
+import html
+import numpy as np
+import pandas as pd
+
+
+#SERVER-SIDE PAGING FOR THE DATA TABS
+#a table is only ever sent one page at a time. sorting a selection uses a permutation of the
+#whole frame per column and direction, built the first time that column is sorted on, so a
+#sorted page is a mask lookup over the permutation instead of sorting the selected rows
+class SortIndex:
+
+    def __init__(self, df):
+        self.df = df
+        self.n = len(df)
+        self.row_dtype = np.min_scalar_type(max(self.n - 1, 0))
+        self.orders = {}
+
+    #row positions in column order, missing values last either way, ties in frame order
+    def order(self, col, descending=False):
+        key = (col, descending)
+        if key not in self.orders:
+            #sorting small integer codes is much faster than sorting the values (strings above all)
+            codes, uniques = pd.factorize(self.df[col], sort=True)
+            rank = np.where(codes < 0, len(uniques), len(uniques) - 1 - codes if descending else codes)
+            self.orders[key] = np.argsort(rank, kind='stable').astype(self.row_dtype)
+        return self.orders[key]
+
+    #rows (unique positions) in the order of col, unchanged when col is None
+    def sort(self, rows, col=None, descending=False):
+        if col is None:
+            return rows
+        order = self.order(col, descending)
+        if len(rows) == self.n:
+            return order
+        keep = np.zeros(self.n, dtype=bool)
+        keep[rows] = True
+        return order[keep[order]]
+
+
+def page_count(n, size):
+    return max((n + size - 1) // size, 1)
+
+
+#page (0-based) of rows, clamped to the pages there are
+def page_rows(rows, page, size):
+    page = min(max(page, 0), page_count(len(rows), size) - 1)
+    return rows[page * size:(page + 1) * size]
+
+
+def _cell(v, fmt):
+    if fmt is not None:
+        return fmt(v)
+    if v is None or v is pd.NA or (isinstance(v, float) and np.isnan(v)):
+        return ''
+    #floats at the precision a pandas Styler shows by default
+    return f'{v:.6f}' if isinstance(v, float) else str(v)
+
+
+#ONE PAGE AS AN HTML TABLE
+#formats maps a column to a function of one value, highlight is a bool per row of the page
+def page_html(df, formats=None, highlight=None, highlight_color='#DC143C'):
+    formats = formats or {}
+    head = ''.join(f'<th style="text-align: left;">{html.escape(str(c))}</th>' for c in df.columns)
+
+    cols = [[html.escape(_cell(v, formats.get(c))) for v in df[c].tolist()] for c in df.columns]
+    highlight = np.zeros(len(df), dtype=bool) if highlight is None else np.asarray(highlight, dtype=bool)
+
+    body = []
+    for i, row in enumerate(zip(*cols)):
+        style = f' style="background-color: {highlight_color};"' if highlight[i] else ''
+        body.append(f'<tr{style}>' + ''.join(f'<td>{v}</td>' for v in row) + '</tr>')
+
+    return f'<table class="dataframe shiny-table table w-auto"><thead><tr>{head}</tr></thead><tbody>{"".join(body)}</tbody></table>'
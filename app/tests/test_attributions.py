@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from shiny import reactive
+from features import gone_mask
+from predictor import profile_key
+
+
+#calculator argument order, from the extract's columns
+_PROFILE = ['last_evaluation', 'number_project', 'average_monthly_hours', 'time_spend_company', 'work_accident', 'promotion_last_5years', 'salary_amount']
+
+
+@pytest.fixture(scope='module')
+def shared():
+    import shared
+    return shared
+
+
+@pytest.fixture(scope='module')
+def attributions(shared):
+    with reactive.isolate():
+        return shared.employees(), *shared.employee_attributions()
+
+
+#current employees' positions and their profiles as typed into the calculator: the extract's
+#values, not the loaded frame's
+def profiles(df):
+    import shared
+    raw = shared.read_employees()
+    assert (raw['id'].to_numpy() == df['id'].to_numpy()).all()
+    rows = np.flatnonzero(~gone_mask(df))
+    return rows, [tuple(raw[c].iat[r] for c in _PROFILE) for r in rows]
+
+
+#every current employee's own profile is answered from the batch, without a model pass
+def test_known_profiles_hit(shared, attributions):
+    df, contrib, known = attributions
+    rows, profs = profiles(df)
+
+    assert all(profile_key(*p) in known for p in profs)
+
+    explained = len(shared.predict_profile.explained)
+    with reactive.isolate():
+        for r, p in zip(rows[:200], profs[:200]):
+            np.testing.assert_array_equal(shared.explain_profile(*p), contrib[known[profile_key(*p)]])
+    assert len(shared.predict_profile.explained) == explained
+
+
+#the batch explains the probabilities the extract was scored with: each row sums to its margin
+def test_attributions_sum_to_scored_prob(attributions):
+    df, contrib, known = attributions
+    rows, _ = profiles(df)
+
+    prob = 1 / (1 + np.exp(-contrib[rows].astype('float64').sum(axis=1)))
+    np.testing.assert_allclose(prob, df['prob'].to_numpy()[rows], rtol=0, atol=1e-5)
+    assert np.isnan(contrib[gone_mask(df)]).all()
+
+
+def test_known_matches_a_model_pass(shared, attributions):
+    df, contrib, known = attributions
+    _, profs = profiles(df)
+
+    for p in profs[:50]:
+        np.testing.assert_allclose(contrib[known[profile_key(*p)]], shared.predict_profile.contributions(*p), rtol=0, atol=1e-6)
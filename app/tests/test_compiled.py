@@ -0,0 +1,93 @@
+import pickle
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+from features import featurize, _FEATURES
+from compiled import CompiledModel, compile_model, check_parity, _TOLERANCE
+
+#the pickles need the libraries they were made with
+pytest.importorskip('xgboost')
+pytest.importorskip('sklearn')
+
+
+_APP = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope='module')
+def pickled():
+    with open(_APP / 'model.pkl', 'rb') as f:
+        model = pickle.load(f)
+    with open(_APP / 'fitted_scaler.pkl', 'rb') as f:
+        scaler = pickle.load(f)
+    return model, scaler
+
+
+@pytest.fixture(scope='module')
+def features():
+    return featurize(pd.read_csv(_APP / 'rawraw.csv', dtype={'average_monthly_hours': float, 'last_evaluation': float, 'time_spend_company': float, 'salary': int}))
+
+
+def test_compiled_matches_predict_proba(pickled, features):
+    model, scaler = pickled
+    compiled = compile_model(model, scaler)
+
+    expected = model.predict_proba(scaler.transform(features))
+    np.testing.assert_allclose(compiled.predict_proba(features), expected, rtol=0, atol=_TOLERANCE)
+    assert check_parity(compiled, model, scaler, features) <= _TOLERANCE
+
+
+#random rows over (and past) the features' ranges, with missing values
+def test_compiled_matches_predict_proba_off_the_extract(pickled, features):
+    model, scaler = pickled
+    compiled = compile_model(model, scaler)
+
+    rng = np.random.default_rng(0)
+    lo, hi = features.min().to_numpy(), features.max().to_numpy()
+    X = rng.uniform(lo - (hi - lo) * 0.1, hi + (hi - lo) * 0.1, size=(20000, len(_FEATURES)))
+    X[rng.random(X.shape) < 0.05] = np.nan
+    X = pd.DataFrame(X, columns=_FEATURES)
+
+    expected = model.predict_proba(scaler.transform(X))[:,1]
+    np.testing.assert_allclose(compiled.predict(X), expected, rtol=0, atol=_TOLERANCE)
+
+
+def test_saved_model_predicts_the_same(pickled, features, tmp_path):
+    compiled = compile_model(*pickled)
+    compiled.save(tmp_path / 'model.npz')
+
+    loaded = CompiledModel.load(tmp_path / 'model.npz')
+    np.testing.assert_array_equal(loaded.predict(features), compiled.predict(features))
+
+
+#ensembles too big for the leaf-mask tables walk the nodes instead, to the same leaves
+def test_walking_the_trees_matches_the_masks(pickled, features):
+    compiled = compile_model(*pickled)
+    walked = CompiledModel({**compiled.arrays, 'masks': compiled.masks[:0]})
+
+    rng = np.random.default_rng(1)
+    X = rng.normal(0, 3, size=(5000, len(_FEATURES))).astype('float32')
+    X[rng.random(X.shape) < 0.05] = np.nan
+    np.testing.assert_array_equal(walked.predict_scaled(X), compiled.predict_scaled(X))
+    np.testing.assert_array_equal(walked.predict(features), compiled.predict(features))
+
+
+#large inputs are split over threads, each writing its own blocks
+def test_threads_predict_the_same(pickled, features, monkeypatch):
+    compiled = compile_model(*pickled)
+    X = compiled.transform(features.iloc[np.arange(50000) % len(features)])
+    expected = compiled.predict_scaled(X)
+
+    monkeypatch.setattr('compiled._THREADS', 3)
+    np.testing.assert_array_equal(compiled.predict_scaled(X), expected)
+
+
+def test_refuses_trees_with_too_many_leaves(pickled):
+    import xgboost
+    _, scaler = pickled
+
+    rng = np.random.default_rng(2)
+    X = rng.normal(size=(4000, len(_FEATURES)))
+    model = xgboost.XGBClassifier(n_estimators=2, max_depth=10, min_child_weight=0).fit(X, rng.random(4000) < .5)
+    with pytest.raises(ValueError, match='more than 64 leaves'):
+        compile_model(model, scaler)
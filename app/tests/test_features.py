@@ -0,0 +1,50 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+from features import featurize, gone_mask, leaving_label, _FEATURES
+
+
+_APP = Path(__file__).resolve().parent.parent
+
+
+#THE ROW-WISE RULES get_df_main AND process_inputs USED BEFORE features.py
+def transform_row(row):
+    return {
+        'last_evaluation': row['last_evaluation'] / 10.0,
+        'work_accident': 1 if row['work_accident'] else 0,
+        'number_project': row['number_project'],
+        'average_monthly_hours': row['average_monthly_hours'],
+        'time_spend_company': row['time_spend_company'],
+        'promotion_last_5years': 1 if row['promotion_last_5years'] else 0,
+        'salary': 0 if row['salary_amount'] < 12000000 else 1 if row['salary_amount'] < 20000000 else 2
+    }
+
+
+@pytest.fixture(scope='module')
+def raw():
+    df = pd.read_csv(_APP / 'rawraw.csv', dtype={'average_monthly_hours': float, 'last_evaluation': float, 'time_spend_company': float, 'salary': int})
+    #the band edges and either side of them
+    edges = df.iloc[:6].copy()
+    edges['salary_amount'] = [11999999, 12000000, 12000001, 19999999, 20000000, 20000001]
+    return pd.concat([df, edges], ignore_index=True)
+
+
+def test_featurize_matches_rows(raw):
+    expected = raw.apply(transform_row, axis=1, result_type='expand')[_FEATURES]
+    got = featurize(raw)
+
+    assert list(got.columns) == _FEATURES
+    np.testing.assert_array_equal(got.to_numpy(dtype='float64'), expected.to_numpy(dtype='float64'))
+
+
+def test_gone_and_labels_match_rows(raw):
+    prob = pd.Series(np.random.default_rng(0).random(len(raw)))
+    prob.iloc[:3] = [0.6, np.nextafter(0.6, 0), 0.0]
+
+    expected_prob = raw.assign(prob=prob).apply(lambda x: None if x['gone'] else x['prob'], axis=1)
+    expected = expected_prob.apply(lambda x: 'Staying' if x < 0.6 else 'Leaving' if pd.notna(x) else None)
+
+    prob[gone_mask(raw)] = np.nan
+    np.testing.assert_array_equal(prob.to_numpy(), expected_prob.to_numpy(dtype='float64'))
+    assert list(leaving_label(prob, 0.6)) == list(expected)
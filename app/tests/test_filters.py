@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+from filters import EmployeeIndex, SurveyIndex
+
+
+@pytest.fixture(scope='module')
+def employees():
+    rng = np.random.default_rng(0)
+    n = 5003
+    prob = rng.random(n)
+    #values sitting exactly on percent cuts, and past employees without one
+    prob[:101] = np.arange(101) / 100
+    prob[rng.random(n) < .2] = np.nan
+    return pd.DataFrame({'department': pd.Categorical(rng.choice(['IT', 'Sales', 'Support'], n)), 'prob': prob, 'gone': np.isnan(prob)})
+
+
+@pytest.fixture(scope='module')
+def responses():
+    rng = np.random.default_rng(1)
+    days = pd.to_datetime('2023-01-08') + pd.to_timedelta(rng.choice(np.arange(0, 700, 7), 3001), unit='D')
+    return pd.DataFrame({'Department': pd.Categorical(rng.choice(['IT', 'Sales', 'Support'], 3001)), 'Date': days})
+
+
+#whole percents take the cut bitmaps, anything else the sorted copy
+@pytest.mark.parametrize('lo, hi', [(0, 1), (.2, .8), (.5, .5), (0, 0), (1, 1), (.8, .2), (.205, .7999), (.2, .80001), (-1, 2)])
+def test_prob_ranges_match_pandas(employees, lo, hi):
+    index = EmployeeIndex(employees)
+    prob = employees['prob']
+    for depts in (None, ['IT', 'Support']):
+        expected = prob.isna() | prob.between(lo, hi)
+        if depts is not None:
+            expected &= employees['department'].isin(depts)
+        assert np.array_equal(index.select(depts, (lo, hi)), np.flatnonzero(expected))
+
+
+#days with and without responses, before, after and across the whole range
+@pytest.mark.parametrize('start, end', [
+    ('2023-01-08', '2024-12-22'), ('2023-03-01', '2023-09-30'), ('2023-01-15', '2023-01-15'), ('2023-01-16', '2023-01-20'),
+    ('2020-01-01', '2030-01-01'), ('2020-01-01', '2020-12-31'), ('2025-01-01', '2025-12-31'), ('2023-09-30', '2023-03-01'),
+])
+def test_date_ranges_match_pandas(responses, start, end):
+    index = SurveyIndex(responses)
+    dates = (pd.Timestamp(start), pd.Timestamp(end))
+    for depts in (None, ['Sales']):
+        expected = responses['Date'].between(*dates)
+        if depts is not None:
+            expected &= responses['Department'].isin(depts)
+        assert np.array_equal(index.select(depts, dates), np.flatnonzero(expected))
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+
+#LEAVING/STAYING AT ANY THRESHOLD
+#the probabilities of current employees, sorted within each department and kept as one array
+#of 2 * department code + probability, so the departments follow each other in code order.
+#the staying count of every department at threshold t is then a single searchsorted of
+#2 * code + t, departments x log(headcount) whatever the headcount
+class ThresholdIndex:
+
+    def __init__(self, df):
+        prob = df['prob'].to_numpy(dtype='float64', na_value=np.nan)
+        dept = df['department'].astype('category')
+        self.departments = dept.cat.categories
+
+        ok = ~np.isnan(prob)
+        codes = dept.cat.codes.to_numpy()[ok]
+        #probabilities are in [0, 1], so a department's keys never reach the next one's
+        self.keys = np.sort(2.0 * codes + prob[ok])
+        self.offsets = np.searchsorted(self.keys, 2.0 * np.arange(len(self.departments) + 1))
+
+    #employees staying (probability below threshold) and in total, per department code
+    def staying(self, threshold):
+        below = np.searchsorted(self.keys, 2.0 * np.arange(len(self.departments)) + threshold, side='left')
+        return below - self.offsets[:-1], np.diff(self.offsets)
+
+    #department, Leaving/Staying, count, laid out like ChurnCube.count(['department', 'Leaving/Staying'])
+    #leaving from threshold up, like leaving_label. departments without current employees are left out
+    def counts(self, threshold):
+        staying, total = self.staying(threshold)
+        has = np.flatnonzero(total > 0)
+        return pd.DataFrame({
+            'department': pd.Categorical(np.repeat(self.departments[has], 2), categories=self.departments),
+            'Leaving/Staying': pd.Categorical(np.tile(['Leaving', 'Staying'], len(has)), categories=['Leaving', 'Staying']),
+            'count': np.column_stack([total[has] - staying[has], staying[has]]).ravel(),
+        })
+
+    #(leaving, current employees) over every department
+    def leaving(self, threshold):
+        staying, total = self.staying(threshold)
+        return int(total.sum() - staying.sum()), int(total.sum())